@@ -23,10 +23,10 @@ if __package__ is None or __package__ == "":
 
 from config import config
 from pof.failure_mode import FailureMode
-from pof.helper import fill_blanks
 from pof.indicator import Indicator
 from pof.pof_base import PofBase
 from pof.pof_container import PofContainer
+from pof.timeline_store import event_counts, sum_events, unique_events
 import pof.demo as demo
 from pof.interface.figures import (
     make_ms_fig,
@@ -63,6 +63,10 @@ class Component(PofBase):
 
     TIME_VARIABLES = []
     POF_VARIABLES = ["indicator", "fm"]
+    UNCOMPARED_VARIABLES = PofBase.UNCOMPARED_VARIABLES + ["_untreated"]
+
+    # The latest untreated pof and the distributions it was calculated from
+    _untreated = None
 
     def __init__(
         self,
@@ -192,14 +196,68 @@ class Component(PofBase):
         self.n = 0
         self.n_sens = 0
 
-    def mp_timeline(self, t_end, t_start=0, n_iterations=DEFAULT_ITERATIONS):
-        """ Simulate the timeline mutliple times and exit immediately if updated"""
+    def _rng_children(self):
+        """ Returns the failure modes and indicators that need their own random number generator"""
+        return [*self.fm.values(), *self.indicator.values()]
+
+    def set_keep_timelines(self, keep_timelines=True):
+        """ Sets whether each failure mode and indicator keeps the timeline for every iteration or only a summary"""
+        self.keep_timelines = keep_timelines
+
+        for fm in self.fm.values():
+            fm.set_keep_timelines(keep_timelines)
+
+        for indicator in self.indicator.values():
+            indicator.set_keep_timelines(keep_timelines)
+
+    def mp_timeline(
+        self,
+        t_end,
+        t_start=0,
+        n_iterations=DEFAULT_ITERATIONS,
+        n_workers=None,
+        seed=None,
+        keep_timelines=True,
+        tolerance=None,
+        max_iterations=None,
+    ):
+        """
+        Simulate the timeline mutliple times and exit immediately if updated. If a tolerance is given, batches of
+        n_iterations are simulated until the simulation error is below the tolerance or max_iterations is reached
+        """
+        self.set_keep_timelines(keep_timelines)
         self.reset()
+        self.set_rng(seed)
         self.up_to_date = True
         self.n = 0
         self.n_iterations = n_iterations
 
         try:
+            if tolerance is not None:
+                self.n_iterations = max_iterations or config["PofBase"].get(
+                    "max_iterations"
+                )
+                self._adaptive_timeline(
+                    t_end=t_end,
+                    t_start=t_start,
+                    batch_size=n_iterations,
+                    tolerance=tolerance,
+                    max_iterations=max_iterations,
+                    n_workers=n_workers,
+                    seed=seed,
+                )
+                return
+
+            if n_workers is not None and n_workers > 1:
+                self._parallel_timeline(
+                    t_end=t_end,
+                    t_start=t_start,
+                    n_iterations=n_iterations,
+                    n_workers=n_workers,
+                    seed=seed,
+                )
+                return
+
             for __ in tqdm(range(self.n_iterations), desc="Simulation", leave=False):
                 if not self.up_to_date:
                     break
@@ -208,6 +266,7 @@ class Component(PofBase):
                 self.sim_timeline(t_end=t_end, t_start=t_start)
                 self.save_timeline(self.n)
                 self.increment_counter()
+                self.record_convergence()
                 self.reset_for_next_sim()
 
                 self.n += 1
@@ -217,14 +276,57 @@ class Component(PofBase):
             else:
                 logging.warning("Error caught during cancel_sim")
 
-    def mc_timeline(self, t_end, t_start=0, n_iterations=DEFAULT_ITERATIONS):
-        """ Simulate the timeline mutliple times"""
+    def mc_timeline(
+        self,
+        t_end,
+        t_start=0,
+        n_iterations=DEFAULT_ITERATIONS,
+        n_workers=None,
+        seed=None,
+        keep_timelines=True,
+        tolerance=None,
+        max_iterations=None,
+    ):
+        """
+        Simulate the timeline mutliple times with an option to split the iterations across n_workers processes. If a
+        tolerance is given, batches of n_iterations are simulated until the simulation error is below the tolerance or
+        max_iterations is reached
+        """
+        self.set_keep_timelines(keep_timelines)
+        self.up_to_date = True
+
+        if tolerance is not None:
+            self.reset()
+            self.set_rng(seed)
+            self._adaptive_timeline(
+                t_end=t_end,
+                t_start=t_start,
+                batch_size=n_iterations,
+                tolerance=tolerance,
+                max_iterations=max_iterations,
+                n_workers=n_workers,
+                seed=seed,
+            )
+            return
+
+        if n_workers is not None and n_workers > 1:
+            self._parallel_timeline(
+                t_end=t_end,
+                t_start=t_start,
+                n_iterations=n_iterations,
+                n_workers=n_workers,
+                seed=seed,
+            )
+            return
+
         self.reset()
+        self.set_rng(seed)
 
         for i in tqdm(range(n_iterations), desc="Simulation", leave=False):
             self.sim_timeline(t_end=t_end, t_start=t_start)
             self.save_timeline(i)
             self.increment_counter()
+            self.record_convergence()
             self.reset_for_next_sim()
 
     def sim_timeline(self, t_end, t_start=0):
@@ -354,6 +456,10 @@ class Component(PofBase):
         for fm in self.fm.values():
             fm.increment_counter()
 
+    def n_failures(self):
+        """ Returns the number of functional failures simulated since the last reset"""
+        return sum(len(fm._t_func_failure) for fm in self.fm.values())
+
     def save_timeline(self, idx):
         for fm in self.fm.values():
             fm.save_timeline(idx)
@@ -361,6 +467,19 @@ class Component(PofBase):
         for ind in self.indicator.values():
             ind.save_timeline(idx)
 
+    def merge_sim(self, other):
+        """ Merges the simulation results from another copy of this component """
+        offset = self._sim_counter
+
+        for fm_name, fm in self.fm.items():
+            fm.merge_sim(other.fm[fm_name], offset=offset)
+
+        for ind_name, ind in self.indicator.items():
+            ind.merge_sim(other.indicator[ind_name], offset=offset)
+
+        self._t_in_service.extend(other._t_in_service)
+        self._sim_counter += other._sim_counter
+
     # ****************** Progress *******************
 
     def progress(self) -> float:
@@ -397,7 +516,7 @@ class Component(PofBase):
 
     def expected_cf(self):
         """ Returns the conditional failures for the component """
-        t_cf = []
+        t_cf = self._new_events()
         for fm in self.fm.values():
             t_cf.extend(fm.expected_cf())
 
@@ -405,22 +524,31 @@ class Component(PofBase):
 
     def expected_ff(self):
         """Returns the functional failures for the component"""
-        t_ff = []
+        t_ff = self._new_events()
         for fm in self.fm.values():
             t_ff.extend(fm.expected_ff())
 
         return t_ff
 
     def expected_life(self):
-        e_l = (
-            sum(self._t_in_service + self.expected_cf() + self.expected_ff())
-            / self._sim_counter
-        )
+        t_life = self._new_events()
+        for events in [self._t_in_service, self.expected_cf(), self.expected_ff()]:
+            t_life.extend(events)
+
+        e_l = sum_events(t_life) / self._sim_counter
 
         return e_l
 
     def expected_untreated(self, t_start=0, t_end=100):
 
+        # Reuse the last result while the untreated distributions are unchanged
+        key = (t_start, t_end) + tuple(
+            (fm.name, fm.active, fm.untreated.alpha, fm.untreated.beta, fm.untreated.gamma)
+            for fm in self.fm.values()
+        )
+        if self._untreated is not None and self._untreated[0] == key:
+            return self._untreated[1]
+
         sf = dict(all=dict(pof=np.full((t_end - t_start + 1), 1)))
         for fm in self.fm.values():
             sf[fm.name] = dict()
@@ -442,6 +570,10 @@ class Component(PofBase):
             cdf[fm]["time"] = np.linspace(
                 t_start, t_end, t_end - t_start + 1, dtype=int
             )
+            cdf[fm]["pof"].flags.writeable = False
+            cdf[fm]["time"].flags.writeable = False
+
+        self._untreated = (key, cdf)
 
         return cdf
 
@@ -486,46 +618,72 @@ class Component(PofBase):
 
     def expected_risk_cost_df(self, t_start=0, t_end=None):
         """ A wrapper for expected risk cost that returns a dataframe"""
-        erc = self.expected_risk_cost()
+        # The event times, unit cost and active flag for each task and the risk of each failure mode
+        events = {}
+        for fm in self.fm.values():
+            for task in fm.tasks.values():
+                events[fm.name, task.name] = (task.t_completion, task.cost, task.active & fm.active)
+            events[fm.name, "risk"] = (fm._t_func_failure, fm.consequence.cost, fm.active)
+
+        counts = {key: event_counts(t_events) for key, (t_events, __, __) in events.items()}
 
         if t_end == None:
-            t_end = t_start
-            for timeline in erc.values():
-                for task in timeline.values():
-                    if isinstance(task, bool):
-                        continue
-                    else:
-                        t_end = max(max(task["time"], default=t_start), t_end)
-
-        df = pd.DataFrame().from_dict(erc, orient="index")
-        df.index.name = "failure_mode"
-        df = df.reset_index().melt(id_vars="failure_mode", var_name="task")
-        df = pd.concat(
-            [df.drop(columns=["value"]), df["value"].apply(pd.Series)], axis=1
-        )[
-            [
-                "failure_mode",
-                "task",
-                "active",
-                "time",
-                "quantity",
-                "cost",
-            ]
-        ].dropna()
-
-        # Fill in the missing dates for plotting purposes
-        fill_cols = ["cost", "quantity"]  # time not needed
-        df_filled = df.apply(fill_blanks, axis=1, args=(t_start, t_end, fill_cols))
-        df = df_filled.explode("time")
+            t_end = max(
+                [t_start] + [np.flatnonzero(count)[-1] for count in counts.values() if count.any()]
+            )
 
-        for col in fill_cols:
-            df[col] = df_filled.explode(col)[col]
-            df[col + "_cumulative"] = df.groupby(by=["failure_mode", "task"])[
-                col
-            ].transform(pd.Series.cumsum)
-            df[col + "_annual"] = df[col] / self.expected_life()
+        # Each row is a task for a failure mode, ordered by task and then failure mode
+        fm_names = list(self.fm)
+        task_names = list(dict.fromkeys(task_name for __, task_name in events))
+        rows = [
+            (i_task * len(fm_names) + i_fm, fm_name, task_name)
+            for i_task, task_name in enumerate(task_names)
+            for i_fm, fm_name in enumerate(fm_names)
+            if (fm_name, task_name) in events
+        ]
+
+        # Count the events at each time step, filling in the missing dates for plotting purposes
+        n = t_end - t_start + 1
+        keys = [(fm_name, task_name) for __, fm_name, task_name in rows]
+        count = np.zeros((len(rows), n))
+        for i, key in enumerate(keys):
+            row_count = counts[key][:n]
+            count[i, : len(row_count)] = row_count
+
+        # Scale the counts by the number of iterations of each failure mode and cost them
+        scaling = np.array([self.fm[fm_name]._sim_counter for fm_name, __ in keys])
+        unit_cost = np.array([events[key][1] for key in keys], dtype=float)
+        has_events = count > 0
+
+        fill_cols = ["cost", "quantity"]
+        filled = {col: np.zeros((len(rows), n)) for col in fill_cols}
+        np.divide(count, scaling[:, np.newaxis], out=filled["quantity"], where=has_events)
+        np.multiply(
+            filled["quantity"], unit_cost[:, np.newaxis], out=filled["cost"], where=has_events
+        )
 
-            df[col + "_lifecycle"] = df[col + "_cumulative"] / self.expected_life()
+        idx, fm_col, task_col = zip(*rows) if rows else ((), (), ())
+        active = [events[key][2] for key in keys]
+
+        df = pd.DataFrame(
+            dict(
+                failure_mode=np.repeat(fm_col, n),
+                task=np.repeat(task_col, n),
+                active=np.repeat(np.array(active, dtype=bool), n),
+                time=np.tile(np.linspace(t_start, t_end, n, dtype=int), len(rows)),
+                quantity=filled["quantity"].ravel(),
+                cost=filled["cost"].ravel(),
+            ),
+            index=np.repeat(np.array(idx, dtype=int), n),
+        )
+
+        expected_life = self.expected_life()
+
+        for col in fill_cols:
+            cumulative = filled[col].cumsum(axis=1).ravel()
+            df[col + "_cumulative"] = cumulative
+            df[col + "_annual"] = df[col] / expected_life
+            df[col + "_lifecycle"] = cumulative / expected_life
 
         # Formatting
         self.df_erc = sort_df(df=df, column="task")
@@ -727,44 +885,36 @@ class Component(PofBase):
         raise NotImplementedError()
 
     def calc_pof_df(self, t_end=None):
-        # TODO this could be way more efficient
+        """ Create df_pof with a row for each strategy, source and time """
+
         pof = dict(
-            maint=pd.DataFrame(self.expected_pof(t_end=t_end)),
-            no_maint=pd.DataFrame(self.expected_untreated(t_end=t_end)),
+            maint=self.expected_pof(t_end=t_end),
+            no_maint=self.expected_untreated(t_end=t_end),
         )
 
-        # OLD CODE
-        # df = pd.concat(pof).rename_axis(["strategy", "time"]).reset_index()
-        # df.index.names = ["strategy", "key"]
-        # df = df.rename(columns={"variable": "source"})
-
-        # df = df.melt(
-        #     id_vars=["time", "strategy", "fm_active"],
-        #     var_name="source",
-        #     value_name="pof",
-        # )
-
-        df = pd.concat(pof).rename_axis(["strategy", "key"]).reset_index()
-
-        df_pof = df[df["key"] == "pof"]
-        df_pof = pd.melt(
-            df_pof, id_vars=["strategy"], value_vars=df_pof.columns[2:]
-        ).rename(columns={"variable": "source", "value": "pof"})
-        df_pof = df_pof.explode("pof", ignore_index=True)
-
-        df_active = df[df["key"] == "active"]
-        df_active = pd.melt(
-            df_active, id_vars=["strategy"], value_vars=df_active.columns[2:]
-        ).rename(columns={"variable": "source", "value": "active"})
-
-        df_time = df[df["key"] == "time"]
-        df_time = pd.melt(
-            df_time, id_vars=["strategy"], value_vars=df_time.columns[2:]
-        ).rename(columns={"variable": "source", "value": "time"})
-        df_time = df_time.explode("time", ignore_index=True)["time"]
-
-        df = df_pof.merge(df_active, on=["strategy", "source"])
-        df["time"] = df_time
+        # A block of rows for each source and strategy, with a single empty row
+        # for failure modes that are missing from a strategy
+        missing = dict(pof=[np.nan], active=np.nan, time=[np.nan])
+        sources = dict.fromkeys(source for curves in pof.values() for source in curves)
+        blocks = [
+            (strategy, source, pof[strategy].get(source, missing))
+            for source in sources
+            for strategy in pof
+        ]
+        lengths = [len(curve["pof"]) for __, __, curve in blocks]
+
+        active = np.empty(len(blocks), dtype=object)
+        active[:] = [curve["active"] for __, __, curve in blocks]
+
+        df = pd.DataFrame(
+            dict(
+                strategy=np.repeat([strategy for strategy, __, __ in blocks], lengths),
+                source=np.repeat([source for __, source, __ in blocks], lengths),
+                pof=np.concatenate([curve["pof"] for __, __, curve in blocks]),
+                active=np.repeat(active, lengths),
+                time=np.concatenate([curve["time"] for __, __, curve in blocks]),
+            )
+        ).infer_objects()
 
         self.df_pof = df
 
@@ -862,7 +1012,7 @@ class Component(PofBase):
                     f_names = ["cf", "ff"]
                     f_ages = [_cf, _ff]
                     for f_name, f_age in zip(f_names, f_ages):
-                        age, count = np.unique(f_age, return_counts=True)
+                        age, count = unique_events(f_age)
 
                         # Scale age based on the units
                         # TODO this will need to be fixed so its works ith units in all direction *UR as int * UR
@@ -1091,7 +1241,8 @@ class Component(PofBase):
 
         # Reset counters
         self._sim_counter = 0
-        self._t_in_service = []
+        self.reset_convergence()
+        self._t_in_service = self._new_events()
         self.stop_simulation = False
 
         # Reset stored reports
@@ -3,6 +3,7 @@ from dataclasses import dataclass, field
 import logging
 
 import numpy as np
+import scipy.special as sc
 import scipy.stats as ss
 
 # Change the system path when this is run directly
@@ -20,6 +21,27 @@ from pof.pof_container import PofContainer
 cf = config["Distribution"]
 
 
+# ****************** Weibull ******************
+
+
+def weibull_sf(x, alpha, beta, gamma):
+    """ Returns the survival function of a three parameter Weibull distribution without the scipy.stats overhead"""
+    if alpha <= 0 or beta <= 0:
+        return ss.weibull_min.sf(x, beta, scale=alpha, loc=gamma)
+
+    z = np.maximum((np.asarray(x) - gamma) / alpha, 0)
+    return np.exp(-np.power(z, beta))
+
+
+def weibull_cdf(x, alpha, beta, gamma):
+    """ Returns the cdf of a three parameter Weibull distribution without the scipy.stats overhead"""
+    if alpha <= 0 or beta <= 0:
+        return ss.weibull_min.cdf(x, beta, scale=alpha, loc=gamma)
+
+    z = np.maximum((np.asarray(x) - gamma) / alpha, 0)
+    return -sc.expm1(-np.power(z, beta))
+
+
 class DistributionManager(PofContainer):
 
     pf_interval = 0
@@ -64,6 +86,11 @@ class Distribution(PofBase):
     TIME_VARIABLES = ["alpha", "gamma"]
     POF_VARIABLES = []
 
+    UNCOMPARED_VARIABLES = PofBase.UNCOMPARED_VARIABLES + ["_curves"]
+
+    # The latest curves for each set of parameters and times, cleared when the parameters change
+    _curves = None
+
     def __init__(self, name="dist", alpha=50, beta=1.5, gamma=10, *args, **kwargs):
         super().__init__(name=name, *args, **kwargs)
         self.alpha = alpha
@@ -82,6 +109,7 @@ class Distribution(PofBase):
     @check_arg_positive("value")
     def alpha(self, value: float):
         self._alpha = value
+        self._curves = None
 
     @property
     def beta(self):
@@ -92,6 +120,7 @@ class Distribution(PofBase):
     @check_arg_positive("value")
     def beta(self, value: float):
         self._beta = value
+        self._curves = None
 
     @property
     def gamma(self):
@@ -102,6 +131,7 @@ class Distribution(PofBase):
     @check_arg_positive("value")
     def gamma(self, value: float):
         self._gamma = value
+        self._curves = None
 
     def params(self):
         params = dict(
@@ -112,16 +142,14 @@ class Distribution(PofBase):
         return params
 
     def sf(self, t_start, t_end):
-        X = np.linspace(t_start, t_end, t_end - t_start + 1)
-        return ss.weibull_min.sf(X, self.beta, scale=self.alpha, loc=self.gamma)
+        return self._curve("sf", t_start, t_end)
 
     def cdf(self, t_start, t_end):
-        X = np.linspace(t_start, t_end, t_end - t_start + 1)
-        return ss.weibull_min.cdf(X, self.beta, scale=self.alpha, loc=self.gamma)
+        return self._curve("cdf", t_start, t_end)
 
     def conditional_f(self, x_min, x_max):
-        P_min = ss.weibull_min.sf(x_min, self.beta, scale=self.alpha, loc=self.gamma)
-        P_max = ss.weibull_min.sf(x_max, self.beta, scale=self.alpha, loc=self.gamma)
+        P_min = weibull_sf(x_min, self.alpha, self.beta, self.gamma)
+        P_max = weibull_sf(x_max, self.alpha, self.beta, self.gamma)
         P = 1 - P_max / P_min
 
         return P
@@ -130,16 +158,52 @@ class Distribution(PofBase):
         self, x_min, x_max
     ):  # TODO Occa should this be total failure rate (cdf) or conditional failure
 
-        P_min = ss.weibull_min.sf(x_min, self.beta, scale=self.alpha, loc=self.gamma)
-        P_max = ss.weibull_min.sf(x_max, self.beta, scale=self.alpha, loc=self.gamma)
+        P_min = weibull_sf(x_min, self.alpha, self.beta, self.gamma)
+        P_max = weibull_sf(x_max, self.alpha, self.beta, self.gamma)
         P = P_max / P_min
 
         return P
 
+    def _curve(self, kind, t_start, t_end):
+        """
+        Returns the sf, cdf, csf or cff from t_start to t_end. Curves are kept for the current parameters so repeated
+        calls reuse the same read-only array
+        """
+        key = (kind, self.alpha, self.beta, self.gamma, t_start, t_end)
+
+        if self._curves is None:
+            self._curves = dict()
+
+        curve = self._curves.get(key)
+
+        if curve is None:
+            if kind in ("sf", "cdf"):
+                X = np.linspace(t_start, t_end, t_end - t_start + 1)
+            else:
+                X = np.arange(t_start, t_end + 1, 1)
+
+            if kind == "cdf":
+                curve = weibull_cdf(X, self.alpha, self.beta, self.gamma)
+            else:
+                curve = weibull_sf(X, self.alpha, self.beta, self.gamma)
+
+            if kind == "csf":
+                curve = curve / curve[0]
+            elif kind == "cff":
+                curve = 1 - curve / curve[0]
+
+            curve.flags.writeable = False
+
+            if len(self._curves) >= cf.get("curve_cache_size", 32):
+                self._curves.pop(next(iter(self._curves)))
+            self._curves[key] = curve
+
+        return curve
+
     def sample(self, size=1):
-        return ss.weibull_min.rvs(
-            self.beta, scale=self.alpha, loc=self.gamma, size=size
-        )
+        # Inverse cdf of the weibull distribution
+        u = self.sample_uniform(size=size)
+        return self.gamma + self.alpha * (-np.log1p(-u)) ** (1 / self.beta)
 
     def likelihood(self, x=None):  # TODO not sure if we need this
 
@@ -170,15 +234,7 @@ class Distribution(PofBase):
         return cls.from_dict(data)
 
     def csf(self, t_start, t_end):
-        t_interval = np.arange(t_start, t_end + 1, 1)
-
-        P_interval = ss.weibull_min.sf(
-            t_interval, self.beta, scale=self.alpha, loc=self.gamma
-        )
-
-        P = P_interval / P_interval[0]
-
-        return P
+        return self._curve("csf", t_start, t_end)
 
     @classmethod
     def from_pf_interval(cls, dist, pf_interval):
@@ -203,15 +259,7 @@ class Distribution(PofBase):
         return new_dist
 
     def cff(self, t_start, t_end):
-        t_interval = np.arange(t_start, t_end + 1, 1)
-
-        P_interval = ss.weibull_min.sf(
-            t_interval, self.beta, scale=self.alpha, loc=self.gamma
-        )
-
-        P = 1 - P_interval / P_interval[0]
-
-        return P
+        return self._curve("cff", t_start, t_end)
 
     # def update_from_dict(self, dict_data):
 
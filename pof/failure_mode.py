@@ -38,13 +38,14 @@ if __package__ is None or __package__ == "":
 
 from config import config
 from pof.pof_container import PofContainer
-from pof.helper import fill_blanks, str_to_dict
+from pof.helper import fill_blanks, str_to_dict, TaskQueue
 from pof.indicator import Indicator, ConditionIndicator
 from pof.distribution import Distribution, DistributionManager
 from pof.consequence import Consequence
-from pof.task import Task
+from pof.task import Task, Inspection
 import pof.demo as demo
 from pof.pof_base import PofBase
+from pof.timeline_store import unique_events
 from pof.decorators import check_arg_positive
 
 
@@ -87,10 +88,19 @@ class FailureMode(PofBase):
     # #TODO convert any get/set pairs to properties
 
     # Class Variables
-    PF_CURVES = ["linear", "step"]
+    PF_CURVES = ConditionIndicator.PF_CURVES
     REQUIRED_STATES = ["initiation", "detection", "failure"]
     TIME_VARIABLES = ["pf_interval", "pf_std"]
     POF_VARIABLES = ["indicators", "tasks", "untreated"]  # temp change to untreated
+    UNCOMPARED_VARIABLES = PofBase.UNCOMPARED_VARIABLES + [
+        "_task_queue",
+        "_dependencies",
+        "_plan",
+        "_pof_fit",
+    ]
+
+    # The durations, events and gamma used for the last expected pof and the distribution fitted to them
+    _pof_fit = None
 
     def __init__(
         self,
@@ -110,6 +120,7 @@ class FailureMode(PofBase):
 
         super().__init__(name=name, **kwargs)
 
+        self._plan = None
         self.dists = PofContainer()
         self.indicators = PofContainer()
         self.conditions = dict()
@@ -133,7 +144,9 @@ class FailureMode(PofBase):
         self.set_states(states)
 
         self.timeline = dict()
-        self._timelines = dict()
+        self._timelines = self._new_timelines()
+        self._task_queue = None
+        self._dependencies = dict()
         self._sim_counter = 0
         self._t_func_failure = []  # Failure event
         self._t_cond_failure = []  # System impact without a failure event
@@ -215,6 +228,7 @@ class FailureMode(PofBase):
     def set_indicators(self, var=None):
 
         self.set_obj("indicators", Indicator, var)
+        self._plan = None
 
     def set_conditions(self, var=None):
         """
@@ -223,6 +237,8 @@ class FailureMode(PofBase):
         # TODO Add checks to create the condition if it doesn't exist
         # TODO Make this work for different pf_intervals for different conditions
 
+        self._plan = None
+
         if bool(var):
             if "name" in var:
                 self.conditions = {var["name"]: var}
@@ -294,6 +310,7 @@ class FailureMode(PofBase):
         Takes a dictionary of tasks and sets the failure mode tasks
         """
         self.set_obj("tasks", Task, tasks)
+        self._plan = None
 
     # ************** Get Functions *****************
 
@@ -341,15 +358,357 @@ class FailureMode(PofBase):
 
     # ****************** Timeline ******************
 
-    def mc_timeline(self, t_end, t_start=0, n_iterations=100):
+    def _rng_children(self):
+        """ Returns the distributions, tasks and indicators that need their own random number generator"""
+        return [*self.dists.values(), *self.tasks.values(), *self.indicators.values()]
+
+    def set_keep_timelines(self, keep_timelines=True):
+        """ Sets whether the timeline for every iteration is kept or only summarised"""
+        self.keep_timelines = keep_timelines
 
+        for task in self.tasks.values():
+            task.set_keep_timelines(keep_timelines)
+
+        for indicator in self.indicators.values():
+            indicator.set_keep_timelines(keep_timelines)
+
+    def mc_timeline(
+        self,
+        t_end,
+        t_start=0,
+        n_iterations=100,
+        batch=False,
+        seed=None,
+        keep_timelines=True,
+    ):
+        """
+        Simulate the timeline multiple times with an option to simulate all the iterations at once and an option to
+        only keep a summary of the timelines
+        """
+
+        self.set_keep_timelines(keep_timelines)
         self.reset()  # TODO ditch this
+        self.set_rng(seed)
+        self._timelines.reserve(n_iterations)
+
+        if batch and self._batch_supported(t_end=t_end, t_start=t_start):
+            self._mc_timeline_batch(
+                t_end=t_end, t_start=t_start, n_iterations=n_iterations
+            )
+
+        else:
+            if batch:
+                logging.debug(
+                    "FailureMode %s - batch not supported, using single timelines",
+                    self.name,
+                )
+
+            for i in tqdm(range(n_iterations)):
+                self.sim_timeline(t_end=t_end, t_start=t_start)
+                self.increment_counter()
+                self.save_timeline(i)
+                self.reset_for_next_sim()
+
+    def _batch_task_type(self, task):
+        """
+        Returns how a task is treated in a batch simulation or None if it can't be batched
+
+            terminal:   has a system impact and ends the timeline when it is completed
+            detective:  an inspection that can only change the detection state
+        """
+        impacts = task.impacts
+        if not all(impact in impacts for impact in ["condition", "state", "system"]):
+            return None
+
+        if impacts["system"] in ["component", "system"]:
+            if task.trigger == "time":
+                return "terminal"
+
+            if (
+                task.trigger == "condition"
+                and task.task_completion == "immediate"
+                and set(task.get_triggers("state")).issubset(self.REQUIRED_STATES)
+            ):
+                return "terminal"
+
+        elif (
+            isinstance(task, Inspection)
+            and task.trigger == "time"
+            and not impacts["condition"]
+            and all(
+                state == "detection" and value == True
+                for state, value in impacts["state"].items()
+            )
+        ):
+            return "detective"
+
+        return None
+
+    def _batch_supported(self, t_end, t_start=0):
+        """
+        Returns True if the timelines can be simulated as a batch. Tasks that renew the failure mode without a system impact
+        (e.g. repairs) change the condition mid timeline and need to be simulated one timeline at a time
+        """
+        if not (self.active and cf.get("remain_failed") and t_start == 0 and t_end > 0):
+            return False
+
+        for cond_name in self._cond_to_update():
+            if not isinstance(self.indicators[cond_name], ConditionIndicator):
+                return False
+
+        for task in self.tasks.values():
+            if task.active and self._batch_task_type(task) is None:
+                return False
+
+        return True
+
+    def _mc_timeline_batch(self, t_end, t_start=0, n_iterations=100):
+        """
+        Simulates all the timelines at once using (n_iterations, t) arrays. Returns the same failures and task completions
+        as the single timeline simulation for failure modes that are supported by _batch_supported
+        """
+        n = n_iterations
+        t = np.arange(t_start, t_end + 1)
+        self.reset_for_next_sim()
+
+        # Initiation
+        if self.is_initiated():
+            t_initiate = np.full(n, t_start)
+        else:
+            t_initiate = np.minimum(
+                t_end + 1,
+                t_start + np.round(self.dists["init"].sample(size=n)).astype(int),
+            )
+
+        timeline = dict(
+            initiation=t >= t_initiate[:, np.newaxis],
+            detection=np.full((n, len(t)), self.is_detected()),
+            failure=np.full((n, len(t)), self.is_failed()),
+        )
+
+        # Conditions and the failures they cause
+        cond_timelines = dict()
+        for cond_name in self._cond_to_update():
+            indicator = self.indicators[cond_name]
+
+            if cond_name in self.conditions:
+                tl_cond = indicator.sim_timelines(
+                    t_start=t_start - t_initiate,
+                    t_stop=t_end - t_initiate,
+                    pf_interval=self.get_pf_interval(cond_name),
+                )
+            else:
+                tl_cond = indicator.sim_timelines(
+                    t_start=np.full(n, t_start - t_end), t_stop=np.full(n, 0)
+                )
+
+            if indicator.decreasing == True:
+                timeline["failure"] |= tl_cond <= indicator.threshold_failure
+            else:
+                timeline["failure"] |= tl_cond >= indicator.threshold_failure
+
+            cond_timelines[cond_name] = tl_cond
+            timeline[cond_name] = tl_cond.astype(int)
+
+        # Scheduled tasks
+        active = [task for task in self.tasks.values() if task.active]
+        t_due = dict()
+        for task in active:
+            if task.trigger == "time":
+                schedule = task.sim_timeline(t_end=t_end, t_start=t_start)
+                t_due[task.name] = t[schedule == 0]
+
+        # A task due at t_end is not completed if a task was completed at t_end - 1
+        detective = [
+            task for task in active if self._batch_task_type(task) == "detective"
+        ]
+        skip_end = any(t_end - 1 in t_due[task.name] for task in detective)
+        t_last = t_end - 1 if skip_end else t_end
+
+        # Detection from the first effective detective task before the undetected timeline ends
+        t_terminal = self._batch_t_terminal(active, timeline, cond_timelines, t_due, t)
+        t_detect = np.full(n, t_end + 1)
+        if not self.is_detected():
+            t_stop = np.full(n, t_end + 1)
+            for t_task in t_terminal.values():
+                t_stop = np.minimum(t_stop, t_task)
+            t_detect = self._batch_t_detect(
+                detective, timeline, t_due, np.minimum(t_stop, t_last), t
+            )
+
+            # The timeline isn't updated by a detection in the last increment
+            t_detect[t_detect + 1 >= t_end] = t_end + 1
+            timeline["detection"] = t > t_detect[:, np.newaxis]
+
+            if (t_detect <= t_end).any():
+                t_terminal = self._batch_t_terminal(
+                    active, timeline, cond_timelines, t_due, t
+                )
+
+        t_stop = np.full(n, t_end + 1)
+        for t_task in t_terminal.values():
+            t_stop = np.minimum(t_stop, t_task)
+        terminal = t_stop <= t_last
+        t_last = np.where(terminal, t_stop, t_last)
+
+        # Record the task completions and failures
+        rows = np.arange(n)
+        failed = timeline["failure"][rows, np.minimum(t_stop, t_end) - t_start]
+        for task in active:
+            if task.name in t_terminal:
+                completed = terminal & (t_terminal[task.name] == t_stop)
+                t_completion = t_stop[completed]
+
+                self._t_func_failure.extend(t_stop[completed & failed].tolist())
+                self._t_cond_failure.extend(t_stop[completed & ~failed].tolist())
+            else:
+                due = t_due[task.name]
+                completed = due <= t_last[:, np.newaxis]
+                t_completion = np.broadcast_to(due, completed.shape)[completed]
+
+            task.record_many(t_completion.tolist())
+
+        # Task timelines
+        for task in self.tasks.values():
+            if task.active and task.trigger == "condition":
+                timeline[task.name] = (
+                    self._batch_condition_trigger(task, timeline, cond_timelines).astype(
+                        int
+                    )
+                    - 1
+                )
+            else:
+                timeline[task.name] = np.broadcast_to(
+                    task.sim_timeline(t_end=t_end, t_start=t_start).astype(int),
+                    (n, len(t)),
+                )
+
+        # Save the timelines
+        length = np.where(terminal, t_stop + 1, t_end + 1) - t_start
+        timeline = dict(time=np.broadcast_to(t, (n, len(t))), **timeline)
+        self._timelines.save_many(0, timeline, lengths=length)
+        self.timeline = {key: tl[-1, : length[-1]] for key, tl in timeline.items()}
+
+        for ind_name, indicator in self.indicators.items():
+            if ind_name in cond_timelines:
+                timelines = {self._name: cond_timelines[ind_name]}
+            else:
+                timelines = dict()
+            indicator.save_timelines(timelines, n_iterations=n)
+
+        self._sim_counter = self._sim_counter + n
+        self.reset_for_next_sim()
+
+    def _batch_t_terminal(self, active, timeline, cond_timelines, t_due, t):
+        """ Returns the first time each terminal task is completed in each timeline"""
+        n = len(timeline["failure"])
+        t_end = t[-1]
+
+        t_terminal = dict()
+        for task in active:
+            if self._batch_task_type(task) != "terminal":
+                continue
+
+            if task.trigger == "time":
+                t_first = t_due[task.name][0] if len(t_due[task.name]) else t_end + 1
+                t_terminal[task.name] = np.full(n, t_first)
+
+            else:
+                triggered = self._batch_condition_trigger(
+                    task, timeline, cond_timelines
+                )
+                t_terminal[task.name] = np.where(
+                    triggered.any(axis=1), t[triggered.argmax(axis=1)], t_end + 1
+                )
+
+        return t_terminal
+
+    def _batch_t_detect(self, tasks, timeline, t_due, t_last, t):
+        """
+        Returns the time each timeline is detected by the inspections that are due up to t_last. The effectiveness is
+        drawn in the same order as the single timelines, which draw for each inspection until the timeline is detected
+        """
+        n = len(t_last)
+        t_never = t[-1] + 1
+        t_detect = np.full(n, t_never)
+
+        # The number of inspections due before each timeline ends
+        due = [t_due[task.name] for task in tasks]
+        n_due = [np.searchsorted(t_task, t_last, side="right") for t_task in due]
+        samples = [
+            task.peek_uniform(int(n_task.sum())) for task, n_task in zip(tasks, n_due)
+        ]
+        can_detect = [
+            self._batch_can_detect(task, timeline, t_task - t[0])
+            for task, t_task in zip(tasks, due)
+        ]
+
+        # Timelines that can't be detected use a draw for every inspection, so only the timelines that can be
+        # detected need to be checked in order to find where the next timeline starts drawing
+        start = [np.concatenate([[0], np.cumsum(n_task)]) for n_task in n_due]
+        unused = [0] * len(tasks)
+        rows = np.full(n, False)
+        for n_task, detect in zip(n_due, can_detect):
+            rows |= (detect & (np.arange(detect.shape[1]) < n_task[:, np.newaxis])).any(axis=1)
+
+        for i in np.flatnonzero(rows):
+            t_first = t_never
+            for k, task in enumerate(tasks):
+                idx = start[k][i] - unused[k]
+                m = n_due[k][i]
+                effective = samples[k][idx : idx + m] <= task.p_effective
+                effective &= can_detect[k][i, :m]
+                if effective.any():
+                    t_first = min(t_first, due[k][effective.argmax()])
+
+            for k in range(len(tasks)):
+                m = n_due[k][i]
+                unused[k] += m - np.searchsorted(due[k][:m], t_first, side="right")
+
+            t_detect[i] = t_first
+
+        for task, n_task, n_unused in zip(tasks, n_due, unused):
+            task.sample_uniform(int(n_task.sum()) - n_unused)
+
+        return t_detect
+
+    def _batch_can_detect(self, task, timeline, t_due):
+        """ Returns an (n, len(t_due)) array showing if an effective inspection would detect the failure mode"""
+        shape = (len(timeline["failure"]), len(t_due))
+        if not task.impacts["state"]:
+            return np.full(shape, False)
+
+        # Check the triggers at the due times only
+        names = [*task.triggers["state"], *task.triggers["condition"]]
+        due = {name: timeline[name][:, t_due] for name in names}
+        triggered = task.trigger_predicate(due, t_start=0, t_end=len(t_due))
+
+        return np.broadcast_to(triggered, shape)
+
+    def _batch_condition_trigger(self, task, timeline, cond_timelines):
+        """ Returns an (n, t) array showing when the triggers for a condition task are met"""
+        s_trigger = np.full(timeline["failure"].shape, True)
+        c_trigger = not task.triggers["condition"]
+
+        for state, trigger in task.triggers["state"].items():
+            s_trigger = s_trigger & (timeline[state] == trigger)
+
+        for condition, trigger in task.triggers["condition"].items():
+            tl_condition = self.indicators[condition]._aggregate(
+                cond_timelines[condition][np.newaxis]
+            )
+            lower = True
+            upper = True
 
-        for i in tqdm(range(n_iterations)):
-            self.sim_timeline(t_end=t_end, t_start=t_start)
-            self.increment_counter()
-            self.save_timeline(i)
-            self.reset_for_next_sim()
+            if (trigger["lower"] != "min") and (trigger["lower"] is not None):
+                lower = tl_condition >= trigger["lower"]
+
+            if (trigger["upper"] != "max") and (trigger["upper"] is not None):
+                upper = tl_condition <= trigger["upper"]
+
+            c_trigger = c_trigger | (lower & upper)
+
+        return s_trigger & c_trigger
 
     def sim_timeline(self, t_end, t_start=0):
 
@@ -452,20 +811,56 @@ class FailureMode(PofBase):
             timeline[task.name] = np.full(increments, -1)
 
         self.timeline = timeline
+        self._task_queue = None
+        self._dependencies = dict()
 
     def _cond_to_update(self):
-        # TODO change this function so that it doesn't get calculated all the time, only updated on changes
-        cond_to_update = set(self.conditions)
+        return self.plan["conditions"]
+
+    @property
+    def plan(self):
+        """ The conditions and tasks to update in the order they are simulated. Rebuilt after the model changes"""
+        if self._plan is None:
+            self._plan = self._build_plan()
+        return self._plan
+
+    def _build_plan(self):
+        """
+        Returns a dictionary with
+            conditions:         the conditions for the failure mode and any conditions that trigger tasks
+            time_tasks:         the names of the time triggered tasks
+            condition_tasks:    the names of the condition triggered tasks
+            triggers:           the state and condition trigger names for each task
+        """
+        conditions = list(self.conditions)
         for task in self.tasks.values():
-            cond_to_update = cond_to_update | set(task.get_triggers("condition"))
+            for cond_name in task.get_triggers("condition"):
+                if cond_name not in conditions:
+                    conditions.append(cond_name)
 
         # Dodgy fix to make sure safety_factor goes last
-        if "safety_factor" in cond_to_update:
-            cond_to_update = list(cond_to_update)
-            cond_to_update.remove("safety_factor")
-            cond_to_update.append("safety_factor")
+        if "safety_factor" in conditions:
+            conditions.remove("safety_factor")
+            conditions.append("safety_factor")
+
+        plan = dict(
+            conditions=conditions,
+            time_tasks=[
+                name for name, task in self.tasks.items() if task.trigger == "time"
+            ],
+            condition_tasks=[
+                name for name, task in self.tasks.items() if task.trigger == "condition"
+            ],
+            triggers={
+                name: dict(
+                    state=set(task.get_triggers("state")),
+                    condition=list(task.get_triggers("condition")),
+                )
+                for name, task in self.tasks.items()
+            },
+        )
 
-        return cond_to_update
+        return plan
 
     def update_timeline(self, t_start, t_end=None, updates=dict()):
         """
@@ -542,7 +937,15 @@ class FailureMode(PofBase):
             if "failure" in updates:
                 self.timeline["failure"][t_start:] = updates.get("failure", False)
 
+            states_changed = {state for state in self.REQUIRED_STATES if state in updates}
+
             for cond_name in self._cond_to_update():
+                # The failure timeline already includes conditions that haven't changed
+                if "failure" not in updates and self._is_current(
+                    ("failure", cond_name), t_start, [cond_name]
+                ):
+                    continue
+
                 tl_f = self.indicators[cond_name].sim_failure_timeline(
                     t_delay=t_start,
                     t_start=t_start - t_initiate,
@@ -551,32 +954,70 @@ class FailureMode(PofBase):
                 self.timeline["failure"][t_start:] = (
                     self.timeline["failure"][t_start:]
                 ) | (tl_f)
+                self._set_current(("failure", cond_name), t_start, [cond_name])
+                states_changed.add("failure")
+
+            plan = self.plan
 
             # Update time based tasks
-            for task_name, task in self.tasks.items():
+            for task_name in plan["time_tasks"]:
+                task = self.tasks[task_name]
 
-                if task.trigger == "time" and task_name in updates:
+                if task_name in updates:
                     self.timeline[task_name][t_start:] = task.sim_timeline(
                         t_start=t_start, t_end=t_end, timeline=self.timeline
                     )
+                    self._reschedule_task(task_name, t_start)
 
             # Check for detection changes
             if "detection" in updates:
                 self.timeline["detection"][t_start:] = updates["detection"]
 
-            # Update condition based tasks if the failure mode initiation has changed
-            for task_name, task in self.tasks.items():
+            # Update condition based tasks if any of their triggers have changed
+            for task_name in plan["condition_tasks"]:
+                task = self.tasks[task_name]
+                triggers = plan["triggers"][task_name]
 
-                if task.trigger == "condition":
-                    self.timeline[task_name][t_start:] = task.sim_timeline(
-                        t_start=t_start,
-                        t_end=t_end,
-                        timeline=self.timeline,
-                        indicators=self.indicators,
-                    )
+                if (
+                    task.task_completion == "immediate"
+                    and not states_changed & triggers["state"]
+                    and self._is_current(("task", task_name), t_start, triggers["condition"])
+                ):
+                    continue
+
+                self.timeline[task_name][t_start:] = task.sim_timeline(
+                    t_start=t_start,
+                    t_end=t_end,
+                    timeline=self.timeline,
+                    indicators=self.indicators,
+                )
+                self._set_current(("task", task_name), t_start, triggers["condition"])
+                self._reschedule_task(task_name, t_start)
 
         return self.timeline
 
+    def _is_current(self, key, t_start, indicators):
+        """
+        Returns True if a timeline was last computed on or before t_start using the current version of the
+        indicators it depends on
+        """
+        computed = self._dependencies.get(key)
+
+        if computed is None:
+            return False
+
+        t_computed, versions = computed
+        return t_computed <= t_start and versions == tuple(
+            self.indicators[ind_name]._version for ind_name in indicators
+        )
+
+    def _set_current(self, key, t_start, indicators):
+        """ Records the time and indicator versions a timeline was computed with"""
+        self._dependencies[key] = (
+            t_start,
+            tuple(self.indicators[ind_name]._version for ind_name in indicators),
+        )
+
     def get_timeline(self, t_start=None, t_end=None):
 
         raise NotImplementedError()
@@ -598,6 +1039,9 @@ class FailureMode(PofBase):
         for var in self.timeline:
             self.timeline[var] = self.timeline[var][:t_fail]
 
+        self._task_queue = None
+        self._dependencies = dict()
+
     def replace(self, t_replace):
         """ Update the asset to a perfect asset """
         state_after_replace = dict(initiation=False, detection=False, failure=False)
@@ -614,6 +1058,9 @@ class FailureMode(PofBase):
         if t_end is None:
             t_end = timeline["time"][-1]
 
+        if cf.get("task_queue", True) and timeline is self.timeline:
+            return self._next_tasks_from_queue(t_start=t_start, t_end=t_end)
+
         next_tasks = []
         next_time = t_end
 
@@ -635,8 +1082,62 @@ class FailureMode(PofBase):
 
         return next_time, next_tasks
 
+    def _next_tasks_from_queue(self, t_start, t_end):
+        """ Returns the next time and the next tasks that will be completed using the task queue"""
+
+        if not self.active:
+            return t_end, []
+
+        if self._task_queue is None:
+            self._task_queue = TaskQueue(self.tasks)
+            for task_name in self.tasks:
+                self._task_queue.push(task_name, self._next_due(task_name, t_start))
+
+        # Reschedule any tasks that were due before t_start
+        t_next, task_names = self._task_queue.peek()
+        while t_next is not None and t_next < t_start:
+            for task_name in task_names:
+                self._task_queue.push(task_name, self._next_due(task_name, t_start))
+            t_next, task_names = self._task_queue.peek()
+
+        if t_next is None:
+            return t_end, []
+
+        t_next = self.timeline["time"][t_next - t_start] + t_start
+
+        if t_next > t_end:
+            return t_end, []
+
+        return t_next, task_names
+
+    def _next_due(self, task_name, t_start):
+        """ Returns the index of the first time a task is due on or after t_start or None if it isn't due"""
+        timeline = self.timeline[task_name]
+        task = self.tasks[task_name]
+
+        # Scheduled tasks are due at a fixed interval so only the countdown needs to be checked
+        if task.trigger == "time" and t_start < len(timeline):
+            t_due = task.next_due(t_start, t_end=len(timeline) - 1)
+            if t_due is not None and timeline[t_start] == t_due - t_start:
+                return t_due
+
+        due = timeline[t_start:] == 0
+
+        if due.any():
+            return t_start + int(np.argmax(due))
+        return None
+
+    def _reschedule_task(self, task_name, t_start):
+        """ Updates the task queue after the timeline for a task has changed from t_start onwards"""
+        if self._task_queue is None:
+            return
+
+        t_due = self._task_queue.due(task_name)
+        if t_due is None or t_due >= t_start:
+            self._task_queue.push(task_name, self._next_due(task_name, t_start))
+
     def save_timeline(self, i):
-        self._timelines[i] = self.timeline
+        self._timelines.save(i, self.timeline)
 
         for ind in self.indicators.values():
             ind.save_timeline(i)
@@ -644,6 +1145,21 @@ class FailureMode(PofBase):
     def increment_counter(self):
         self._sim_counter = self._sim_counter + 1
 
+    def merge_sim(self, other, offset=None):
+        """ Merges the timelines, task completions and failures from another copy of this failure mode """
+        if offset is None:
+            offset = self._sim_counter
+
+        self._timelines.merge(other._timelines, offset=offset)
+
+        for task_name, task in self.tasks.items():
+            task.t_completion.extend(other.tasks[task_name].t_completion)
+            task.cost_completion.extend(other.tasks[task_name].cost_completion)
+
+        self._t_func_failure.extend(other._t_func_failure)
+        self._t_cond_failure.extend(other._t_cond_failure)
+        self._sim_counter = self._sim_counter + other._sim_counter
+
     # ****************** Realised Methods *************
 
     def inspection_effectiveness(self):
@@ -697,14 +1213,12 @@ class FailureMode(PofBase):
         self.lower = dict()
         self.upper = dict()
 
-        for key in self._timelines[0]:
-
-            all_values = np.array([self._timelines[d][key] for d in self._timelines])
+        for key in self._timelines.columns:
 
-            self.expected[key] = all_values.mean(axis=0)
-            self.uncertainty[key] = all_values.std(axis=0)
-            self.lower[key] = np.percentile(all_values, 10, axis=0)
-            self.upper[key] = np.percentile(all_values, 90, axis=0)
+            self.expected[key] = self._timelines.mean(key)
+            self.uncertainty[key] = self._timelines.std(key)
+            self.lower[key] = self._timelines.percentile(key, 10)
+            self.upper[key] = self._timelines.percentile(key, 90)
 
         return self.expected
 
@@ -713,33 +1227,46 @@ class FailureMode(PofBase):
         # TODO general into expected event = 'failure', cumulative = True/False method
         # TODO generalise to work with any event and for cumulative events
         event = "failure"
-        durations = []
-        event_observed = []
 
-        for timeline in self._timelines.values():
-            event_observed.append(timeline[event].any())
-            if event_observed[-1]:
-                durations.append(timeline["time"][timeline[event]][0])
-            else:
-                durations.append(timeline["time"][-1])
+        if self.keep_timelines:
+            durations, event_observed = self._timelines.first_event_times(event)
+        else:
+            # Rebuild the durations from the histograms of the first event
+            t_first, t_censored = self._timelines.first_events(event)
+            t = np.arange(len(t_first)) + int(self._timelines.mean("time")[0])
+            durations = np.concatenate([np.repeat(t, t_first), np.repeat(t, t_censored)])
+            event_observed = np.repeat([True, False], [t_first.sum(), t_censored.sum()])
 
         # Adjust durations based on the gamma to speed up the fitting process
-        durations = np.array(durations)
-        event_observed = np.array(event_observed)
-        durations = durations - self.untreated.gamma
+        gamma = self.untreated.gamma
+        durations = durations - gamma
 
         # Correct for zero times to have occured halfway between the 0 and 0.5
         durations[durations <= 0] = 0.25
 
-        # Fit the weibull
-        wbf = WeibullFitter()
-        wbf.fit(durations=durations, event_observed=event_observed)
-
-        self.pof = Distribution(
-            alpha=wbf.lambda_,
-            beta=wbf.rho_,
-            gamma=self.untreated.gamma,
+        # Reuse the last fit if the timelines haven't changed
+        fit = self._pof_fit
+        if (
+            fit is not None
+            and fit[0] == gamma
+            and np.array_equal(fit[1], durations)
+            and np.array_equal(fit[2], event_observed)
+        ):
+            self.pof = fit[3]
+            return self.pof
+
+        # Fit the weibull starting from the last fit
+        params = fit_weibull_censored(
+            durations, event_observed, rho=fit[3].beta if fit is not None else None
         )
+
+        if params is None:
+            wbf = WeibullFitter()
+            wbf.fit(durations=durations, event_observed=event_observed)
+            params = (wbf.lambda_, wbf.rho_)
+
+        self.pof = Distribution(alpha=params[0], beta=params[1], gamma=gamma)
+        self._pof_fit = (gamma, durations, event_observed, self.pof)
         # self.pof = fit_weibull(durations, event_observed)
 
         return self.pof
@@ -778,9 +1305,7 @@ class FailureMode(PofBase):
         """Get the expected condition for a failure mode"""
         expected = dict()
         for cond_name in self.conditions:
-            expected[cond_name] = np.array(
-                [self._timelines[x][cond_name] for x in self._timelines]
-            ).mean(axis=0)
+            expected[cond_name] = self._timelines.mean(cond_name)
 
         return expected
 
@@ -789,10 +1314,8 @@ class FailureMode(PofBase):
         expected = dict()
         for ind_name, indicator in self.indicators.items():
 
-            ec = np.array([self._timelines[x][ind_name] for x in self._timelines])
-
-            mean = indicator.perfect - ec.mean(axis=0)
-            sd = ec.std(axis=0)
+            mean = indicator.perfect - self._timelines.mean(ind_name)
+            sd = self._timelines.std(ind_name)
             upper = mean + sd * stdev
             lower = mean - sd * stdev
 
@@ -854,7 +1377,7 @@ class FailureMode(PofBase):
         return {**task_cost, **risk}
 
     def expected_risk(self, scaling=1):
-        time, count = np.unique(self._t_func_failure, return_counts=True)
+        time, count = unique_events(self._t_func_failure)
         quantity = count / scaling
         cost = quantity * self.consequence.cost
         risk = {
@@ -909,14 +1432,15 @@ class FailureMode(PofBase):
         for indicator in self.indicators.values():
             indicator.reset()  # TODO will this reset for all, or just for None
 
-        # Reset timelines
+        # Reset timelines and rebuild the plan in case any tasks were changed directly
         self.timeline = dict()
-        self._timelines = dict()
+        self._timelines = self._new_timelines()
+        self._plan = None
 
         # Reset counters
         self._sim_counter = 0
-        self._t_func_failure = []
-        self._t_cond_failure = []
+        self._t_func_failure = self._new_events()
+        self._t_cond_failure = self._new_events()
 
     # ****************** Optimise routines ***********
 
@@ -988,6 +1512,7 @@ class FailureMode(PofBase):
         untreated = copy.copy(self.dists.get("untreated", None))
 
         super().update_from_dict(data)
+        self._plan = None
 
         if untreated != self.untreated:
             self._set_init()
@@ -1000,6 +1525,8 @@ class FailureMode(PofBase):
                 if task.task_group_name == task_group_name:
                     task.update_from_dict(details)
 
+        self._plan = None
+
     def update_consequence(self, data):
         """ Update the consequence of any failure mode """
 
@@ -1090,6 +1617,58 @@ def fit_weibull(durations, event_observed):
     return pof
 
 
+def fit_weibull_censored(durations, event_observed, rho=None, tol=1e-10, max_iterations=100):
+    """
+    Returns the scale and shape of a weibull fitted to right censored durations, or None if it can't be fitted. The
+    shape is found with Newton's method on the profile likelihood, starting from rho if it is provided
+    """
+    t = np.asarray(durations, dtype=float)
+    observed = np.asarray(event_observed, dtype=bool)
+    n_events = observed.sum()
+
+    if n_events == 0 or (t <= 0).any():
+        return None
+
+    log_t = np.log(t)
+    log_max = log_t.max()
+    sum_log_observed = log_t[observed].sum()
+
+    # The likelihood keeps increasing with the shape if every failure is at the longest duration
+    if (log_t[observed] == log_max).all():
+        return None
+
+    # Start from the shape of a Gumbel distribution with the same spread as the log failure times
+    if rho is None:
+        sd = log_t[observed].std()
+        rho = np.pi / (np.sqrt(6) * sd) if n_events > 1 and sd > 0 else 1.0
+
+    for __ in range(max_iterations):
+        w = np.exp(rho * (log_t - log_max))
+        m0 = w.sum()
+        m1 = w @ log_t / m0
+        m2 = w @ (log_t * log_t) / m0
+
+        grad = n_events / rho + sum_log_observed - n_events * m1
+        hess = -n_events / rho ** 2 - n_events * (m2 - m1 * m1)
+
+        rho_next = rho - grad / hess
+        if rho_next <= 0:
+            rho_next = rho / 2
+
+        converged = abs(rho_next - rho) <= tol * rho
+        rho = rho_next
+
+        if converged:
+            break
+    else:
+        return None
+
+    m0 = np.exp(rho * (log_t - log_max)).sum()
+    alpha = np.exp(log_max + (np.log(m0) - np.log(n_events)) / rho)
+
+    return alpha, rho
+
+
 if __name__ == "__main__":
     import doctest
 
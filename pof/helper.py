@@ -1,4 +1,5 @@
 import collections
+import heapq
 import inspect
 
 import numpy as np
@@ -34,6 +35,104 @@ def fill_blanks(row, t_start, t_end, cols):
     return row
 
 
+def seed_sequence(seed=None):
+    """ Returns a numpy SeedSequence from an int, SeedSequence, Generator or None"""
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+
+    if isinstance(seed, np.random.Generator):
+        return np.random.SeedSequence(seed.integers(2 ** 63, size=4))
+
+    return np.random.SeedSequence(seed)
+
+
+class UniformPool:
+    """ A block of uniform random numbers drawn from a generator in bulk and refilled when it runs out"""
+
+    def __init__(self, rng, size=1024):
+        self.rng = rng
+        self.size = size
+        self._values = np.empty(0)
+        self._idx = 0
+
+    def draw(self, size=None):
+        """ Returns a float if size is None, otherwise an array with the shape of size"""
+        n = 1 if size is None else int(np.prod(size))
+
+        values = self._next(n)
+        self._idx = self._idx + n
+
+        if size is None:
+            return values[0]
+        return values.reshape(size).copy()
+
+    def peek(self, n):
+        """ Returns the next n values without drawing them"""
+        return self._next(n).copy()
+
+    def _next(self, n):
+        """ Returns a view of the next n values, refilling the pool if there aren't enough"""
+        if self._idx + n > len(self._values):
+            self._values = np.concatenate(
+                [self._values[self._idx :], self.rng.random(max(self.size, n))]
+            )
+            self._idx = 0
+
+        return self._values[self._idx : self._idx + n]
+
+
+class TaskQueue:
+    """
+    A priority queue with the next time each task is due. Tasks are rescheduled by pushing a new due time and the
+    old entries are dropped lazily when they reach the front of the queue
+    """
+
+    def __init__(self, names):
+        self._order = {name: i for i, name in enumerate(names)}
+        self._due = dict()
+        self._heap = []
+
+    def due(self, name):
+        """ Returns the time a task is due or None if it isn't scheduled"""
+        return self._due.get(name)
+
+    def push(self, name, t_due):
+        """ Sets the time a task is due or unschedules it if t_due is None"""
+        if self._due.get(name) == t_due:
+            return
+
+        if t_due is None:
+            del self._due[name]
+        else:
+            self._due[name] = t_due
+            heapq.heappush(self._heap, (t_due, self._order[name], name))
+
+    def peek(self):
+        """ Returns the earliest due time and the names of the tasks due at that time in the order they were added"""
+        heap = self._heap
+
+        while heap and self._due.get(heap[0][2]) != heap[0][0]:
+            heapq.heappop(heap)
+
+        if not heap:
+            return None, []
+
+        # Pop every entry due at the earliest time, dropping duplicates, and push the valid ones back
+        t_next = heap[0][0]
+        entries = dict()
+        while heap and heap[0][0] == t_next:
+            entry = heapq.heappop(heap)
+            if self._due.get(entry[2]) == t_next:
+                entries[entry[2]] = entry
+
+        for entry in entries.values():
+            heapq.heappush(heap, entry)
+
+        names = [entry[2] for entry in sorted(entries.values())]
+
+        return t_next, names
+
+
 def str_to_dict(id_str, value, sep="-"):
 
     id_str = id_str.split(sep)
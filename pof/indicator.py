@@ -5,12 +5,11 @@
 """
 
 import collections
-import copy
+import functools
 import logging
-from typing import List
+from typing import Dict, List
 
 import numpy as np
-import pandas as pd
 import scipy.stats as ss
 from matplotlib import pyplot as plt
 
@@ -27,6 +26,102 @@ import pof.demo as demo
 
 cf = config["Indicator"]
 
+# Key for the aggregated timeline when only a summary of the timelines is kept
+AGGREGATE = "aggregate"
+
+
+# ****************** P-F curves ******************
+
+
+def _exponential(u, a=3):
+    """ Accelerating loss, μ(t) = b × exp(a × t) shifted so it passes through perfect and failed"""
+    return u if a == 0 else np.expm1(a * u) / np.expm1(a)
+
+
+def _power(u, a=2):
+    """ μ(t) = b × t ^ a"""
+    return u ** a
+
+
+def _logarithmic(u, a=9):
+    """ Decelerating loss, μ(t) = a × ln(t) + b shifted so it starts at t = 0"""
+    return u if a == 0 else np.log1p(a * u) / np.log1p(a)
+
+
+def _lloyd_lipow(u, a=9):
+    """ Decelerating loss, μ(t) = a − (b/t) shifted so it starts at t = 0"""
+    return u * (1 + a) / (1 + a * u)
+
+
+# The fraction of the condition lost at each fraction of the pf_interval
+PF_CURVE_KERNELS = dict(
+    exponential=_exponential,
+    power=_power,
+    logarithmic=_logarithmic,
+    lloyd_lipow=_lloyd_lipow,
+)
+
+
+def pf_curve_condition(pf_curve, perfect, failed, t, pf_interval, pf_curve_params=None):
+    """
+    Returns the condition at times t, which can be an array of any shape, for one of the PF_CURVE_KERNELS. The curve
+    is scaled so the condition is perfect at t = 0 and failed at t = pf_interval
+    """
+    if pf_interval <= 0:
+        u = np.zeros(np.shape(t))
+    else:
+        u = np.clip(np.asarray(t) / pf_interval, 0, 1)
+
+    loss = PF_CURVE_KERNELS[pf_curve](u, **(pf_curve_params or {}))
+
+    return perfect + (failed - perfect) * loss
+
+
+@functools.lru_cache(maxsize=cf.get("profile_cache_size", 1024))
+def condition_profile(pf_curve, perfect, failed, pf_interval, pf_curve_params=()):
+    """
+    Returns the condition at each time step from perfect to failed over the pf_interval. Profiles are cached and
+    shared by every indicator so the array is read-only. pf_curve_params is a tuple of (name, value) pairs that set
+    the shape of the non-linear curves
+
+    Linear: μ(t) = b + a × t
+    Exponential: μ(t) = b × exp(a × t)
+    Power: μ(t) = b × t a
+    Logarithm: μ(t) = a × ln(t) + b
+    Lloyd-Lipow: μ(t) = a − (b/t)
+    """
+    x = np.arange(0, pf_interval + 1, 1)
+
+    if pf_curve == "linear":
+        # Prevent zero division error
+        if pf_interval <= 0:
+            m = 0
+        else:
+            m = (failed - perfect) / pf_interval
+
+        b = perfect
+        y = m * x + b
+
+    elif pf_curve == "step":
+        y = np.append(np.full(pf_interval, perfect), (np.array(failed)))
+
+    elif pf_curve in PF_CURVE_KERNELS:
+        y = pf_curve_condition(
+            pf_curve, perfect, failed, x, pf_interval, dict(pf_curve_params)
+        )
+
+    else:
+        raise NotImplementedError
+
+    y.flags.writeable = False
+
+    return y
+
+
+def profile_cache_info():
+    """ Returns the hits, misses, maxsize and currsize of the condition profile cache"""
+    return condition_profile.cache_info()
+
 
 # TODO move timeline to indicator
 # TODO overload methods to avoid if statements and improve speed
@@ -80,9 +175,28 @@ class Indicator(PofBase):
     """
 
     # Class Variables
-    PF_CURVES = ["linear", "step"]
+    PF_CURVES = ["linear", "step", *PF_CURVE_KERNELS]
     TIME_VARIABLES = ["pf_interval", "pf_std"]
     POF_VARIABLES = []
+    UNCOMPARED_VARIABLES = PofBase.UNCOMPARED_VARIABLES + [
+        "_version",
+        "_changes",
+        "_agg",
+        "_monotone",
+    ]
+
+    # Incremented whenever the timeline changes so dependent timelines can be recomputed
+    _version = 0
+
+    # The first time step changed by each of the latest versions and the aggregated timeline for a version
+    _changes = ()
+    _agg = None
+
+    # The first time step each timeline only moves towards failed from, or None if it isn't known
+    _monotone = None
+
+    # Shape parameters for the non-linear pf curves, set by ConditionIndicator
+    pf_curve_params = None
 
     def __init__(
         self,
@@ -118,7 +232,6 @@ class Indicator(PofBase):
             detection=self.threshold_detection, failure=self.threshold_failure
         )
 
-        self._profile = dict()  # TODO del
         self._timeline: dict()
         self._timelines: dict()
         self.reset()
@@ -132,7 +245,7 @@ class Indicator(PofBase):
         elif indicator_type == "PoleSafetyFactor":
             ind_class = PoleSafetyFactor
 
-        elif pf_curve in ["linear", "step"]:
+        elif pf_curve in ConditionIndicator.PF_CURVES:
             ind_class = ConditionIndicator
 
         elif pf_curve in ["ssf_calc", "dsf_calc"]:
@@ -181,7 +294,42 @@ class Indicator(PofBase):
     def reset(self, cause=NotImplemented):
 
         self._timeline = dict()
-        self._timelines = dict()
+        self._timelines = self._new_timelines()
+        self.timeline_changed()
+
+    def timeline_changed(self, t_from=0):
+        """ Increments the timeline version and records the first time step that changed"""
+        self._version = self._version + 1
+
+        if not isinstance(self._changes, collections.deque):
+            self._changes = collections.deque(maxlen=32)
+        self._changes.append((self._version, t_from))
+
+    def changed_from(self, version):
+        """
+        Returns the first time step that has changed since a version of the timeline, 0 if the version is too old to
+        know or None if nothing has changed
+        """
+        if version == self._version:
+            return None
+
+        if not self._changes or self._changes[0][0] > version + 1:
+            return 0
+
+        return min(t_from for v, t_from in self._changes if v > version)
+
+    def monotone_from(self):
+        """
+        Returns the first time step from which the aggregated timeline only moves towards failed or None if it isn't
+        known to
+        """
+        monotone = self._monotone or dict()
+        t_from = [monotone.get(name) for name in self._timeline]
+
+        if not t_from or None in t_from:
+            return None
+
+        return max(t_from)
 
     def reset_for_next_sim(self):
         NotImplemented
@@ -281,39 +429,73 @@ class Indicator(PofBase):
     # TODO split out into conditionIndicator and simplify this method for Indicator to make it faster
 
     def agg_timeline(self):
+        """
+        Returns the aggregated timeline. It is kept between calls and is marked dirty when the timeline changes, so
+        only the time steps from the first change are aggregated again. The array is read-only and is updated in place
+        """
+        if self._agg is None:
+            t_from = 0
+        else:
+            version, timeline = self._agg
+            t_from = self.changed_from(version)
 
-        if self.decreasing:
-            timeline = self._perfect - (
-                self._perfect - np.array(list(self._timeline.values()))
-            ).sum(axis=0)
-            timeline[timeline < self._failed] = self._failed
+            if t_from is None:
+                return timeline
+
+        timelines = list(self._timeline.values())
+
+        if t_from == 0 or any(len(tl) != len(timeline) for tl in timelines):
+            timeline = self._aggregate(np.array(timelines))
         else:
-            timeline = self._perfect + (
-                np.array(list(self._timeline.values())) - self._perfect
-            ).sum(axis=0)
-            timeline[timeline > self._failed] = self._failed
+            tail = self._aggregate(np.array([tl[t_from:] for tl in timelines]))
+
+            if tail.dtype == timeline.dtype:
+                timeline.flags.writeable = True
+                timeline[t_from:] = tail
+            else:
+                timeline = np.concatenate([timeline[:t_from], tail])
+
+        timeline.flags.writeable = False
+        self._agg = (self._version, timeline)
+
         return timeline
 
     def agg_timelines(self):
         """
-        Takes a dictionary of timelines and returns the aggregated timelines
+        Returns an (n_iterations, t) array with the aggregated timelines for each iteration. The condition loss for
+        each cause is added straight from the columns of the timeline store
         """
-        agg_timeline = []
-        for timeline in self._timelines.values():
+        loss = None
+        for key in self._timelines.columns:
             if self.decreasing:
-                etl = self._perfect - (
-                    self._perfect - np.array(list(timeline.values()))
-                ).sum(axis=0)
-                etl[etl < self._failed] = self._failed
+                cause_loss = self._perfect - self._timelines.stack(key).astype(float)
             else:
-                etl = self._perfect + (
-                    np.array(list(timeline.values())) - self._perfect
-                ).sum(axis=0)
-                etl[etl > self._failed] = self._failed
+                cause_loss = self._timelines.stack(key).astype(float) - self._perfect
 
-            agg_timeline.append(etl)
+            loss = cause_loss if loss is None else np.add(loss, cause_loss, out=loss)
 
-        return np.stack(agg_timeline)
+        if loss is None:
+            return self._aggregate(np.empty((0, 0)))
+
+        if self.decreasing:
+            timeline = self._perfect - loss
+            timeline[timeline < self._failed] = self._failed
+        else:
+            timeline = self._perfect + loss
+            timeline[timeline > self._failed] = self._failed
+        return timeline
+
+    def _aggregate(self, timelines):
+        """
+        Aggregates the condition loss from each cause along the first axis
+        """
+        if self.decreasing:
+            timeline = self._perfect - (self._perfect - timelines).sum(axis=0)
+            timeline[timeline < self._failed] = self._failed
+        else:
+            timeline = self._perfect + (timelines - self._perfect).sum(axis=0)
+            timeline[timeline > self._failed] = self._failed
+        return timeline
 
     def get_timeline(self, name=None):
         # maybe add t_start?
@@ -330,12 +512,22 @@ class Indicator(PofBase):
 
         return timeline
 
+    def get_profile(self, pf_interval=None):
+        """ Returns the read-only condition profile for a pf_interval from the shared profile cache"""
+        if pf_interval is None:
+            pf_interval = self._pf_interval
+
+        params = tuple(sorted((self.pf_curve_params or dict()).items()))
+
+        return condition_profile(
+            self._pf_curve, self._perfect, self._failed, int(pf_interval), params
+        )
+
     #  ********************* Interface methods ***********************
 
     def plot_profile(self):
 
-        for name, profile in self._profile.items():
-            plt.plot(profile, label=name)
+        plt.plot(self.get_profile(), label=self.pf_interval)
 
         plt.title("Indicator Profile")
         plt.show()
@@ -372,48 +564,48 @@ class Indicator(PofBase):
         ec = self.get_timeline()
         return self._expected_condition(ec, conf)"""
 
-    def _expected_condition(self, ec, conf):
-        """
-        Returns the expected condition based
-        """
-        # TODO make work for all condition levels loss:bool=False
+    def _condition_moments(self):
+        """ Returns the mean and standard deviation of the aggregated timelines"""
+        if self.keep_timelines:
+            ec = self.agg_timelines()
+            return ec.mean(axis=0), ec.std(axis=0)
 
-        mean = ec.mean(axis=0)
-        sigma = ec.std(axis=0)
+        return self._timelines.mean(AGGREGATE), self._timelines.std(AGGREGATE)
 
-        # Create a dataframe with mean & sigma
-        df_mean_sigma = pd.DataFrame(
-            data={"mean": mean, "sigma": sigma},
-            columns=["mean", "sigma"],
-        )
+    def _condition_percentiles(self, q):
+        """ Returns the empirical percentiles of the aggregated timelines"""
+        if self.keep_timelines:
+            return np.percentile(self.agg_timelines(), q, axis=0)
 
-        # Filter out rows when sigma = 0
-        mean_filtered = df_mean_sigma[df_mean_sigma["sigma"] != 0]["mean"]
-        sigma_filtered = df_mean_sigma[df_mean_sigma["sigma"] != 0]["sigma"]
+        return np.array([self._timelines.percentile(AGGREGATE, x) for x in q])
 
+    def _expected_condition(self, mean, sigma, conf, method="normal"):
+        """
+        Returns the expected condition and the bounds of the conf interval, which are either from a normal distribution
+        with the mean and sigma or the empirical percentiles of the timelines
+        """
+        # TODO make work for all condition levels loss:bool=False
         # TODO maybe add np.sqr(len(ec)) to make it stderr
 
-        # Calculate bounds
-        df_mean_sigma.loc[df_mean_sigma["sigma"] != 0, "upper"] = ss.norm.ppf(
-            (1 - (1 - conf) / 2), loc=mean_filtered, scale=sigma_filtered
-        )
-        df_mean_sigma.loc[df_mean_sigma["sigma"] != 0, "lower"] = ss.norm.ppf(
-            ((1 - conf) / 2), loc=mean_filtered, scale=sigma_filtered
-        )
+        if method == "normal":
+            # Equivalent to ss.norm.ppf(q, loc=mean, scale=sigma) and equal to the mean when sigma is 0
+            z_score = ss.norm.ppf(1 - (1 - conf) / 2)
+            upper = z_score * sigma + mean
+            lower = -z_score * sigma + mean
 
-        # Adjust upper and lower to the mean if there is not variance (sigma was 0)
-        df_mean_sigma.loc[df_mean_sigma["sigma"] == 0, "upper"] = df_mean_sigma["mean"]
-        df_mean_sigma.loc[df_mean_sigma["sigma"] == 0, "lower"] = df_mean_sigma["mean"]
+        elif method == "percentile":
+            q = round(100 * (1 - conf) / 2, 6)
+            lower, upper = self._condition_percentiles([q, 100 - q])
 
-        upper = df_mean_sigma["upper"]
-        lower = df_mean_sigma["lower"]
+        else:
+            raise ValueError("method must be from: ['normal', 'percentile']")
 
         if self.decreasing:
-            upper[upper > self._perfect] = self._perfect
-            lower[lower < self._failed] = self._failed
+            upper = np.minimum(upper, self._perfect)
+            lower = np.maximum(lower, self._failed)
         else:
-            upper[upper > self._failed] = self._failed
-            lower[lower < self._perfect] = self._perfect
+            upper = np.minimum(upper, self._failed)
+            lower = np.maximum(lower, self._perfect)
 
         expected = dict(
             lower=lower,
@@ -424,7 +616,28 @@ class Indicator(PofBase):
         return expected
 
     def save_timeline(self, idx=None):
-        self._timelines[idx] = copy.deepcopy(self._timeline)
+        # There is nothing to aggregate if the indicator wasn't simulated
+        if self.keep_timelines or not self._timeline:
+            self._timelines.save(idx, self._timeline)
+        else:
+            self._timelines.save(idx, {AGGREGATE: self.agg_timeline()})
+
+    def merge_sim(self, other, offset=0):
+        """ Merges the timelines from another copy of this indicator """
+        self._timelines.merge(other._timelines, offset=offset)
+
+    def save_timelines(self, timelines, n_iterations, idx_start=0):
+        """ Saves a batch of timelines where each cause has an (n_iterations, t) array"""
+        if timelines and not self.keep_timelines:
+            timelines = {
+                AGGREGATE: self._aggregate(np.array(list(timelines.values()), dtype=float))
+            }
+
+        if timelines:
+            self._timelines.save_many(idx_start, timelines)
+        else:
+            for i in range(n_iterations):
+                self._timelines.save(idx_start + i, dict())
 
     def is_failed(
         self, t_start: int = None, t_end: int = None, cause: str = None
@@ -545,46 +758,8 @@ class CondIndicator:
         return profile
 
     def _calc_profile(self, pf_interval=None):
-
-        # TODO add the other profile types
-        # TODO add functools lru cache
-        """
-        Linear: μ(t) = b + a × t
-        Exponential: μ(t) = b × exp(a × t)
-        Power: μ(t) = b × t a
-        Logarithm: μ(t) = a × ln(t) + b
-        Lloyd-Lipow: μ(t) = a − (b/t)
-
-
-        Args:
-            pf_interval:
-            pf_std:
-
-        Returns:
-
-        """
-
-        x = np.arange(0, pf_interval + 1, 1)
-
-        if self._pf_curve == "linear":
-            # Prevent zero division error
-            if pf_interval <= 0:
-                m = 0
-            else:
-                m = (self._failed - self._perfect) / pf_interval
-
-            b = self._perfect
-            y = m * x + b
-
-        elif self._pf_curve == "step":
-            y = np.append(np.full(pf_interval, self._perfect), (np.array(self._failed)))
-
-        elif self._pf_curve == "exponential":
-            raise NotImplementedError
-        elif self._pf_curve == "exp":
-            raise NotImplementedError
-
-        return y
+        """ Returns the condition profile for the pf_interval"""
+        return self.get_profile(pf_interval)
 
     def is_failed(
         self, t_start: int = None, t_end: int = None, cause: str = None
@@ -697,12 +872,16 @@ class CondIndicator:
 class ConditionIndicator(Indicator):
 
     # Class Variables
-    PF_CURVES = ["linear", "step"]
+    PF_CURVES = ["linear", "step", *PF_CURVE_KERNELS]
+    MONOTONE_PF_CURVES = ["linear", "step"]
 
-    def __init__(self, name: str = "ConditionIndicator", **kwargs):
+    def __init__(
+        self, name: str = "ConditionIndicator", pf_curve_params: Dict = None, **kwargs
+    ):
         super().__init__(name=name, **kwargs)
 
-        self.pf_curve_params = NotImplemented  # TODO for complex condition types
+        # Shape parameters for the non-linear pf curves
+        self.pf_curve_params = dict() if pf_curve_params is None else pf_curve_params
 
         # Current accumulation
         self._accumulated = dict()
@@ -734,26 +913,46 @@ class ConditionIndicator(Indicator):
             self._timeline[name] = self._sim_timeline(
                 t_start=t_start, t_stop=t_stop, pf_interval=pf_interval, name=name
             )
+            t_changed = 0
 
         else:
             if t_delay is None:
                 t_delay = 0
+            t_changed = t_delay
 
-            self._timeline[name][t_delay:] = self._sim_timeline(
+            timeline = self._timeline[name][t_delay:]
+            condition = self._sim_timeline(
                 t_start=t_start,
                 t_stop=t_stop,
                 pf_interval=pf_interval,
                 pf_std=pf_std,
                 name=name,
+                out=timeline,
             )
+            if condition is not timeline:
+                timeline[:] = condition
+
+        # The timeline is rewritten from t_changed as the current condition, the profile and then the failed condition
+        if self._monotone is None:
+            self._monotone = dict()
+        if (
+            self.decreasing
+            and self.pf_curve in self.MONOTONE_PF_CURVES
+            and self._perfect - self.get_accumulated() >= self._failed
+        ):
+            self._monotone[name] = t_changed
+        else:
+            self._monotone[name] = None
+
+        self.timeline_changed(t_from=t_changed)
 
         return self._timeline[name][t_delay:]
 
     def _sim_timeline(
-        self, t_stop=None, t_start=0, pf_interval=None, pf_std=None, name=None
+        self, t_stop=None, t_start=0, pf_interval=None, pf_std=None, name=None, out=None
     ):
         """
-        Returns the timeline that considers all the accumulated degradation
+        Returns the timeline that considers all the accumulated degradation, written into out if it is provided
         """
 
         # Use the condition parameters if unique parameters aren't provided TODO maybe remove
@@ -765,39 +964,22 @@ class ConditionIndicator(Indicator):
 
         # Adjust the pf_interval based on the expected variance in pf_std
         if pf_std is not None and pf_std != 0:
-            pf_interval = int(pf_interval + round(ss.norm.rvs(loc=0, scale=pf_std)))
-
-        # Set the condition profile if it hasn't been created already or if uncertainty is needed
-        if pf_interval not in self._profile:
-            self._set_profile(pf_interval=pf_interval, name=name)
+            pf_interval = int(pf_interval + round(self.rng.normal(loc=0, scale=pf_std)))
 
         # Get the timeline
         timeline = self._acc_timeline(
-            t_start=t_start, t_stop=t_stop, pf_interval=pf_interval
+            t_start=t_start, t_stop=t_stop, pf_interval=pf_interval, out=out
         )  # , name=name
 
         return timeline
 
-    def _set_profile(
-        self, perfect=None, failed=None, pf_interval=None, pf_std=None, name=None
-    ):
-
-        # TODO Illyse - add the other profile types
-        # TODO maybe make this work using pf_interval and name so that it doesn't do as much recalcuting
+    def sim_timelines(self, t_start, t_stop, pf_interval=None, pf_std=None):
         """
-        Linear: μ(t) = b + a × t
-        Exponential: μ(t) = b × exp(a × t)
-        Power: μ(t) = b × t a
-        Logarithm: μ(t) = a × ln(t) + b
-        Lloyd-Lipow: μ(t) = a − (b/t)
+        Returns an (n, t) array of timelines for arrays of start and stop times that span the same number of increments
         """
-
-        # Use the condition parameters if unique parameters aren't provided TODO maybe remove/
-        if perfect is None:
-            perfect = self._perfect
-
-        if failed is None:
-            failed = self._failed
+        t_start = np.asarray(t_start)
+        t_stop = np.asarray(t_stop)
+        n = len(t_start)
 
         if pf_interval is None:
             pf_interval = self._pf_interval
@@ -805,33 +987,38 @@ class ConditionIndicator(Indicator):
         if pf_std is None:
             pf_std = self.pf_std
 
-        x = np.arange(0, pf_interval + 1, 1)
-
-        if self._pf_curve == "linear":
-            # Prevent zero division error
-            if pf_interval <= 0:
-                m = 0
-            else:
-                m = (failed - perfect) / pf_interval
-            b = perfect
-            y = m * x + b
+        # Adjust the pf_interval for each timeline based on the expected variance in pf_std
+        if pf_std is not None and pf_std != 0:
+            pf_intervals = (
+                pf_interval + np.round(self.rng.normal(loc=0, scale=pf_std, size=n))
+            ).astype(int)
+        else:
+            pf_intervals = np.full(n, pf_interval, dtype=int)
 
-        elif self._pf_curve == "step":
-            y = np.append(np.full(pf_interval, self._perfect), (np.array(self._failed)))
+        # Each timeline is a window of a single timeline that covers all the windows
+        lo = t_start.min()
+        hi = t_stop.max()
+        idx = (t_start - lo)[:, np.newaxis] + np.arange(t_stop[0] - t_start[0] + 1)
 
-        elif self._pf_curve == "exponential" or self._pf_curve == "exp":
-            raise NotImplementedError
+        timelines = np.empty(idx.shape)
+        for pf_interval in np.unique(pf_intervals):
+            rows = pf_intervals == pf_interval
+            timeline = self._acc_timeline(t_start=lo, t_stop=hi, pf_interval=pf_interval)
+            timelines[rows] = timeline[idx[rows]]
 
-        self._profile[pf_interval] = y
+        return timelines
 
-    def _acc_timeline(self, t_start=0, t_stop=None, pf_interval=None, name=None):
+    def _acc_timeline(
+        self, t_start=0, t_stop=None, pf_interval=None, name=None, out=None
+    ):
         # TODO this probably needs a delay?
         """
-        Returns the timeli
+        Returns the condition from t_start to t_stop after the accumulated condition loss. The condition is written
+        directly into out if it is an array of the right length and type, otherwise a new array is returned
         """
 
         # Validate times
-        t_max = pf_interval  # len(self._profile[pf_interval]) - 1
+        t_max = pf_interval
         if t_stop is None:
             t_stop = t_max
 
@@ -842,33 +1029,48 @@ class ConditionIndicator(Indicator):
             t_start = t_start - t_stop
             t_stop = -1
 
-        profile = self._profile[pf_interval][
-            max(0, min(t_start, t_max)) : min(t_stop, t_max) + 1
-        ]
-
-        # Adjust for the accumulated condition
+        profile = self.get_profile(pf_interval)
         accumulated = self.get_accumulated(name=name)
+
+        if self.decreasing:
+            current = self.perfect - accumulated
+        else:
+            current = accumulated
+
+        # Split the timeline into the current condition before t=0, the profile and the failed condition afterwards
+        length = t_stop - t_start + 1
+        n_before = max(0, -t_start)
+        start = max(0, min(t_start, t_max))
+        n_profile = max(0, min(t_stop, t_max) + 1 - start) if t_max >= 0 else 0
+        n_after = length - n_before - n_profile
+
+        dtype = profile.dtype
         if accumulated > 0:
-            profile = profile - accumulated
-            profile[profile < self._failed] = self._failed
+            dtype = np.result_type(dtype, np.asarray(accumulated))
+        if n_before > 0:
+            dtype = np.result_type(dtype, np.asarray(current).dtype)
+        if n_after > 0:
+            dtype = np.result_type(dtype, np.asarray(self._failed).dtype)
+
+        if out is not None and len(out) == length and out.dtype == dtype:
+            timeline = out
+        else:
+            timeline = np.empty(length, dtype=dtype)
 
         # Fill the start with the current condtiion
-        if t_start < 0:
-            if self.decreasing:
-                current = self.perfect - accumulated
-            else:
-                current = accumulated
+        timeline[:n_before] = current
 
-            profile = np.append(
-                np.full(t_start * -1, current), profile
-            )  # Changed from profile[0]
+        # Adjust the profile for the accumulated condition
+        segment = timeline[n_before : n_before + n_profile]
+        segment[:] = profile[start : start + n_profile]
+        if accumulated > 0:
+            segment -= accumulated
+            np.maximum(segment, self._failed, out=segment)
 
         # Fill the end with the failed condition
-        n_after_failure = t_stop - t_start - len(profile) + 1
-        if n_after_failure > 0:
-            profile = np.append(profile, np.full(max(0, n_after_failure), self._failed))
+        timeline[n_before + n_profile :] = self._failed
 
-        return profile
+        return timeline
 
     def sim_failure_timeline(
         self,
@@ -996,6 +1198,7 @@ class ConditionIndicator(Indicator):
             permanent=False,
         )
         self._timeline = dict()
+        self.timeline_changed()
 
     def reset_to_perfect(self):
         self._reset_accumulated()
@@ -1032,9 +1235,9 @@ class ConditionIndicator(Indicator):
 
             self._reset_accumulated(accumulated, permanent=permanent)
 
-    def expected_condition(self, conf=0.5):
-        ec = self.agg_timelines()
-        return self._expected_condition(ec, conf)
+    def expected_condition(self, conf=0.5, method="normal"):
+        mean, sigma = self._condition_moments()
+        return self._expected_condition(mean, sigma, conf, method)
 
     @classmethod
     def demo(cls):
@@ -1046,6 +1249,10 @@ class PoleSafetyFactor(Indicator):
 
     # Class Variables
     PF_CURVES = ["ssf_calc", "dsf_calc"]
+    UNCOMPARED_VARIABLES = Indicator.UNCOMPARED_VARIABLES + ["_input_versions"]
+
+    # The external diameter and wall thickness versions used for the last safety factor
+    _input_versions = None
 
     def __init__(
         self,
@@ -1065,11 +1272,42 @@ class PoleSafetyFactor(Indicator):
     def link_component(self, component):
         self.component = component
 
+    def _inputs(self):
+        """ Returns the external diameter and wall thickness indicators the safety factor is calculated from"""
+        return (
+            self.component.indicator["external_diameter"],
+            self.component.indicator["wall_thickness"],
+        )
+
     def sim_timeline(self, t_delay=0, *args, **kwargs):
         """
-        Overload safety factor
+        Overload safety factor. Only the time steps where the external diameter or wall thickness have changed since
+        the safety factor was last calculated are recalculated
         """
-        self._timeline[None] = self.safety_factor("simple")
+        inputs = self._inputs()
+        versions = tuple(ind._version for ind in inputs)
+        timeline = self._timeline.get(None)
+
+        if timeline is None or self._input_versions is None:
+            t_from = 0
+        else:
+            changes = [
+                ind.changed_from(version)
+                for ind, version in zip(inputs, self._input_versions)
+            ]
+            t_from = min((t for t in changes if t is not None), default=None)
+
+        if t_from is None:
+            return timeline[t_delay:]
+
+        if t_from == 0 or len(timeline) != len(inputs[0].get_timeline()):
+            self._timeline[None] = self.safety_factor("simple")
+            t_from = 0
+        else:
+            timeline[t_from:] = self.safety_factor("simple", t_from=t_from)
+
+        self._input_versions = versions
+        self.timeline_changed(t_from=t_from)
         return self._timeline[None][t_delay:]
 
     def sim_failure_timeline(self, t_delay=0, *args, **kwargs):
@@ -1080,26 +1318,50 @@ class PoleSafetyFactor(Indicator):
 
         return tl_f
 
-    def safety_factor(self, method="simple"):
+    def safety_factor(self, method="simple", t_from=0):
+        """ Returns the safety factor from t_from onwards using the aggregated condition of the component"""
+        external_diameter, wall_thickness = self._inputs()
 
+        return self._safety_factor(
+            agd=external_diameter.perfect,
+            czd=external_diameter.get_timeline()[t_from:],
+            wt=wall_thickness.get_timeline()[t_from:],
+            **self._method_params(method),
+        )
+
+    def safety_factors(self, method="simple", czd=None, wt=None):
+        """
+        Returns an (n_iterations, t) array of safety factors in one expression, by default from the saved timelines
+        of the external diameter and wall thickness. For the actual method the pole load and pole strength can be
+        arrays with a row for each component
+        """
+        external_diameter, wall_thickness = self._inputs()
+
+        if czd is None:
+            czd = external_diameter.agg_timelines()
+
+        if wt is None:
+            wt = wall_thickness.agg_timelines()
+
+        return self._safety_factor(
+            agd=external_diameter.perfect, czd=czd, wt=wt, **self._method_params(method)
+        )
+
+    def _method_params(self, method):
+        """ Returns the pole load and pole strength for the actual method"""
         if method == "simple":
-            sf = self._safety_factor(
-                agd=self.component.indicator["external_diameter"].perfect,
-                czd=self.component.indicator["external_diameter"].get_timeline(),
-                wt=self.component.indicator["wall_thickness"].get_timeline(),
-                margin=4,
-            )
+            params = dict(margin=4)
 
         elif method == "actual":
-            sf = self._safety_factor(
-                agd=self.component.indicator["external_diameter"].perfect,
-                czd=self.component.indicator["external_diameter"].get_timeline(),
-                wt=self.component.indicator["wall_thickness"].get_timeline(),
-                pole_load=self.component.info["pole_load"],
-                pole_strength=self.component.info["pole_strength"],
+            params = dict(
+                pole_load=np.asarray(self.component.info["pole_load"]),
+                pole_strength=np.asarray(self.component.info["pole_strength"]),
             )
 
-        return sf
+        else:
+            raise ValueError("method must be from: ['simple', 'actual']")
+
+        return params
 
     def _safety_factor(
         self, agd, czd, wt, pole_strength=None, pole_load=None, margin=4
@@ -1129,9 +1391,9 @@ class PoleSafetyFactor(Indicator):
 
         return sf
 
-    def expected_condition(self, conf=0.5):
-        ec = self.agg_timelines()
-        return self._expected_condition(ec, conf)
+    def expected_condition(self, conf=0.5, method="normal"):
+        mean, sigma = self._condition_moments()
+        return self._expected_condition(mean, sigma, conf, method)
 
 
 if __name__ == "__main__":
@@ -6,7 +6,10 @@
 """
 
 from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor, wait
+import copy
 import logging
+import multiprocessing
 from typing import Dict
 
 
@@ -27,7 +30,14 @@ if __package__ is None or __package__ == "":
 
 from pof.decorators import coerce_arg_type
 from pof.pof_container import PofContainer
-from pof.helper import str_to_dict, valid_signature, get_signature
+from pof.timeline_store import EventHistogram, TimelineStore, TimelineSummary
+from pof.helper import (
+    str_to_dict,
+    valid_signature,
+    get_signature,
+    seed_sequence,
+    UniformPool,
+)
 from config import config
 from pof.units import valid_units
 from pof.pof_container import PofContainer
@@ -35,6 +45,36 @@ from pof.pof_container import PofContainer
 cf = config["PofBase"]
 cf_main = config["Main"]
 
+# Used by objects that haven't had their own generator set
+_default_rng = np.random.default_rng()
+
+# Set in each worker process so a simulation can be cancelled from the main process
+_cancel_event = None
+
+
+def _init_worker(cancel_event):
+    """ Shares the cancel event with a worker process """
+    global _cancel_event
+    _cancel_event = cancel_event
+
+
+def _sim_worker(obj, t_end, t_start, n_iterations, seed):
+    """ Simulates the timeline multiple times for a copy of an object in a worker process and returns the copy """
+    obj.set_rng(seed)
+
+    obj.reset()
+    for i in range(n_iterations):
+        if _cancel_event is not None and _cancel_event.is_set():
+            break
+
+        obj.sim_timeline(t_end=t_end, t_start=t_start)
+        obj.save_timeline(i)
+        obj.increment_counter()
+        obj.record_convergence()
+        obj.reset_for_next_sim()
+
+    return obj
+
 
 class PofBase:
     """
@@ -44,6 +84,20 @@ class PofBase:
     # Class Variables
     TIME_VARIABLES = []
     POF_VARIABLES = []
+    UNCOMPARED_VARIABLES = ["_rng", "_pool"]
+
+    # Random number generator, set using set_rng, and a pool of uniform samples drawn from it
+    _rng = None
+    _pool = None
+
+    # Keep the timeline for every iteration or only a summary, set using set_keep_timelines
+    keep_timelines = True
+
+    # Failures per iteration used to estimate the simulation error, set using reset_convergence
+    _failures_seen = 0
+    _failures_sum = 0
+    _failures_sq = 0
+    _failures_n = 0
 
     def __init__(self, name="pofbase", units="years", *args, **kwargs):
 
@@ -63,9 +117,17 @@ class PofBase:
 
     def __eq__(self, other):
         if type(other) is type(self):
-            return self.__dict__ == other.__dict__
+            return self._compared_dict() == other._compared_dict()
         return False
 
+    def _compared_dict(self):
+        """ Returns the attributes used to check equality, excluding simulation state such as the rng"""
+        return {
+            key: value
+            for key, value in self.__dict__.items()
+            if key not in self.UNCOMPARED_VARIABLES
+        }
+
     # def __repr__(self):
     #     # TODO alternative version that keens things simple
     #     # sig = get_signature(self)
@@ -92,6 +154,168 @@ class PofBase:
         else:
             raise ValueError("name must be a string")
 
+    # ****************** Random numbers ******************
+
+    @property
+    def rng(self) -> np.random.Generator:
+        """ The random number generator for this object or a shared default if set_rng hasn't been called"""
+        if self._rng is None:
+            return _default_rng
+        return self._rng
+
+    def set_rng(self, seed=None):
+        """
+        Sets the random number generator from a seed and spawns an independent child stream for each of the
+        objects returned by _rng_children
+        """
+        children = self._rng_children()
+        own, *child_seeds = seed_sequence(seed).spawn(len(children) + 1)
+
+        self._rng = np.random.default_rng(own)
+        self._pool = None
+        for child, child_seed in zip(children, child_seeds):
+            child.set_rng(child_seed)
+
+    def _rng_children(self):
+        """ Returns the objects that need their own random number generator"""
+        return []
+
+    def set_keep_timelines(self, keep_timelines=True):
+        """ Sets whether the timeline for every iteration is kept or only summarised"""
+        self.keep_timelines = keep_timelines
+
+    def _new_timelines(self):
+        """ Returns an empty store for the timelines or a summary if the timelines aren't kept"""
+        if self.keep_timelines:
+            return TimelineStore()
+        return TimelineSummary()
+
+    def _new_events(self):
+        """ Returns an empty list for the event times or a histogram if the timelines aren't kept"""
+        if self.keep_timelines:
+            return []
+        return EventHistogram()
+
+    def sample_uniform(self, size=None):
+        """ Returns uniform random numbers from a pre-sampled pool that is refilled from rng when it runs out"""
+        if self._pool is None:
+            self._pool = UniformPool(self.rng, size=cf.get("random_pool_size", 1024))
+        return self._pool.draw(size)
+
+    def peek_uniform(self, n):
+        """ Returns the next n uniform random numbers from the pool without drawing them"""
+        if self._pool is None:
+            self._pool = UniformPool(self.rng, size=cf.get("random_pool_size", 1024))
+        return self._pool.peek(n)
+
+    # ****************** Convergence ******************
+
+    def n_failures(self) -> int:
+        """ Returns the number of functional failures simulated since the last reset"""
+        return 0
+
+    def reset_convergence(self):
+        """ Resets the failure counts used to estimate the simulation error"""
+        self._failures_seen = 0
+        self._failures_sum = 0
+        self._failures_sq = 0
+        self._failures_n = 0
+
+    def record_convergence(self):
+        """ Records the number of failures in the iteration that was just completed"""
+        failures = self.n_failures()
+        x = failures - self._failures_seen
+        self._failures_seen = failures
+        self._failures_sum += x
+        self._failures_sq += x * x
+        self._failures_n += 1
+
+    def merge_convergence(self, other):
+        """ Combines the failure counts from another copy of this object"""
+        self._failures_seen = self.n_failures()
+        self._failures_sum += other._failures_sum
+        self._failures_sq += other._failures_sq
+        self._failures_n += other._failures_n
+
+    def expected_failures(self):
+        """
+        Returns the mean number of failures per iteration and the half-width of its confidence interval, which is
+        used as the simulation error
+        """
+        n = self._failures_n
+        if n < 2:
+            mean = self._failures_sum / n if n else None
+            return mean, np.inf
+
+        mean = self._failures_sum / n
+
+        # Add a pseudo-iteration with no failures and one with a failure (Agresti-Coull) so a small batch where every
+        # iteration has the same outcome doesn't look converged
+        n_adj = n + 2
+        mean_adj = (self._failures_sum + 1) / n_adj
+        var = max(self._failures_sq + 1 - n_adj * mean_adj ** 2, 0) / (n_adj - 1)
+        z_score = ss.norm.ppf(1 - (1 - cf.get("confidence_interval", 0.8)) / 2)
+
+        return mean, z_score * np.sqrt(var / n_adj)
+
+    @property
+    def sim_error(self) -> float:
+        """ The half-width of the confidence interval on the failures per iteration for the last simulation"""
+        return self.expected_failures()[1]
+
+    def _adaptive_timeline(
+        self,
+        t_end,
+        t_start=0,
+        batch_size=10,
+        tolerance=0.05,
+        max_iterations=None,
+        n_workers=None,
+        seed=None,
+    ):
+        """
+        Simulates batches of iterations until the half-width of the confidence interval on the failures per iteration
+        is below the tolerance or max_iterations have been completed. Call after reset and set_rng
+        """
+        if max_iterations is None:
+            max_iterations = cf.get("max_iterations", 1000)
+        seeds = seed_sequence(seed)
+        template = None
+
+        while self._sim_counter < max_iterations and self.up_to_date:
+            n_iterations = min(batch_size, max_iterations - self._sim_counter)
+
+            if n_workers is not None and n_workers > 1:
+                # Workers start from the same template rather than a copy of every result so far
+                if template is None:
+                    template = self._sim_template()
+
+                self._parallel_timeline(
+                    t_end=t_end,
+                    t_start=t_start,
+                    n_iterations=n_iterations,
+                    n_workers=n_workers,
+                    seed=seeds.spawn(1)[0],
+                    reset=False,
+                    template=template,
+                )
+            else:
+                for __ in range(n_iterations):
+                    if not self.up_to_date:
+                        break
+
+                    self.sim_timeline(t_end=t_end, t_start=t_start)
+                    self.save_timeline(self._sim_counter)
+                    self.increment_counter()
+                    self.record_convergence()
+                    self.reset_for_next_sim()
+
+                    self.n += 1
+
+            __, error = self.expected_failures()
+            if error <= tolerance:
+                break
+
     @classmethod
     def load(cls, details=None):
         """
@@ -500,6 +724,63 @@ class PofBase:
     def mc_timeline(self, t_start=None, t_end=None, n_iterations=None):
         raise NotImplementedError()
 
+    def merge_sim(self, other):
+        raise NotImplementedError()
+
+    def _parallel_timeline(
+        self,
+        t_end,
+        t_start=0,
+        n_iterations=10,
+        n_workers=2,
+        seed=None,
+        reset=True,
+        template=None,
+    ):
+        """
+        Splits the iterations across a pool of worker processes that each simulate a seeded copy of a template and merges
+        the results back in the order they were submitted. The template is a copy of this object without any results.
+        Stops every worker if up_to_date is set to False by cancel_sim
+        """
+        if reset:
+            self.reset()
+
+        if template is None:
+            template = self if reset else self._sim_template()
+
+        seeds = seed_sequence(seed).spawn(n_workers)
+        chunks = [len(chunk) for chunk in np.array_split(range(n_iterations), n_workers)]
+        cancel_event = multiprocessing.Event()
+
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(cancel_event,),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _sim_worker, template, t_end, t_start, chunk, worker_seed
+                )
+                for chunk, worker_seed in zip(chunks, seeds)
+                if chunk > 0
+            ]
+
+            for future in futures:
+                while not wait([future], timeout=0.1).done:
+                    if not self.up_to_date:
+                        cancel_event.set()
+
+                result = future.result()
+                self.merge_sim(result)
+                self.merge_convergence(result)
+                self.n = self.n + result._sim_counter
+
+    def _sim_template(self):
+        """ Returns a copy of this object without any simulation results to send to the worker processes"""
+        template = copy.deepcopy(self)
+        template.reset()
+        return template
+
     def save(self, file_name, file_units=None):
         """ Save a json file with a system """
 
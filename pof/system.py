@@ -1,10 +1,12 @@
 # ************ Packages ********************
 import copy
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 from tqdm.auto import tqdm
 
 # Change the system path if an individual file is being run
@@ -24,6 +26,9 @@ from pof.paths import Paths
 
 DEFAULT_ITERATIONS = 10
 
+# Report columns with a small set of repeated labels
+REPORT_CATEGORIES = ["comp", "task", "failure_mode"]
+
 cf = config.get("System")
 cf_main = config.get("Main")
 
@@ -92,24 +97,118 @@ class System(PofBase):
         self.n = 0
         self.n_sens = 0
 
-    def mc_timeline(self, t_end, t_start=0, n_iterations=DEFAULT_ITERATIONS):
-        """ Simulate the timeline mutliple times"""
+    def mc_timeline(
+        self,
+        t_end,
+        t_start=0,
+        n_iterations=DEFAULT_ITERATIONS,
+        n_workers=None,
+        seed=None,
+        keep_timelines=True,
+        tolerance=None,
+        max_iterations=None,
+    ):
+        """
+        Simulate the timeline mutliple times with an option to split the iterations across n_workers processes. If a
+        tolerance is given, batches of n_iterations are simulated until the simulation error is below the tolerance or
+        max_iterations is reached
+        """
+        self.set_keep_timelines(keep_timelines)
+        self.up_to_date = True
+
+        if tolerance is not None:
+            self.reset()
+            self.set_rng(seed)
+            self._adaptive_timeline(
+                t_end=t_end,
+                t_start=t_start,
+                batch_size=n_iterations,
+                tolerance=tolerance,
+                max_iterations=max_iterations,
+                n_workers=n_workers,
+                seed=seed,
+            )
+            return
+
+        if n_workers is not None and n_workers > 1:
+            self._parallel_timeline(
+                t_end=t_end,
+                t_start=t_start,
+                n_iterations=n_iterations,
+                n_workers=n_workers,
+                seed=seed,
+            )
+            return
+
         self.reset()
+        self.set_rng(seed)
 
         for i in tqdm(range(n_iterations)):
             self.sim_timeline(t_end=t_end, t_start=t_start)
             self.save_timeline(i)
             self.increment_counter()
+            self.record_convergence()
             self.reset_for_next_sim()
 
-    def mp_timeline(self, t_end, t_start=0, n_iterations=DEFAULT_ITERATIONS):
-        """ Simulate the timeline mutliple times and exit immediately if updated"""
+    def _rng_children(self):
+        """ Returns the components that need their own random number generator"""
+        return list(self.comp.values())
+
+    def set_keep_timelines(self, keep_timelines=True):
+        """ Sets whether each component keeps the timeline for every iteration or only a summary"""
+        self.keep_timelines = keep_timelines
+
+        for comp in self.comp.values():
+            comp.set_keep_timelines(keep_timelines)
+
+    def mp_timeline(
+        self,
+        t_end,
+        t_start=0,
+        n_iterations=DEFAULT_ITERATIONS,
+        n_workers=None,
+        seed=None,
+        keep_timelines=True,
+        tolerance=None,
+        max_iterations=None,
+    ):
+        """
+        Simulate the timeline mutliple times and exit immediately if updated. If a tolerance is given, batches of
+        n_iterations are simulated until the simulation error is below the tolerance or max_iterations is reached
+        """
+        self.set_keep_timelines(keep_timelines)
         self.reset()
+        self.set_rng(seed)
         self.up_to_date = True
         self.n = 0
         self.n_iterations = n_iterations
 
         try:
+            if tolerance is not None:
+                self.n_iterations = max_iterations or config["PofBase"].get(
+                    "max_iterations"
+                )
+                self._adaptive_timeline(
+                    t_end=t_end,
+                    t_start=t_start,
+                    batch_size=n_iterations,
+                    tolerance=tolerance,
+                    max_iterations=max_iterations,
+                    n_workers=n_workers,
+                    seed=seed,
+                )
+                return
+
+            if n_workers is not None and n_workers > 1:
+                self._parallel_timeline(
+                    t_end=t_end,
+                    t_start=t_start,
+                    n_iterations=n_iterations,
+                    n_workers=n_workers,
+                    seed=seed,
+                )
+                return
+
             for __ in tqdm(range(self.n_iterations)):
                 if not self.up_to_date:
                     break
@@ -118,6 +217,7 @@ class System(PofBase):
                 self.sim_timeline(t_end=t_end, t_start=t_start)
                 self.save_timeline(self.n)
                 self.increment_counter()
+                self.record_convergence()
                 self.reset_for_next_sim()
 
                 self.n += 1
@@ -204,11 +304,22 @@ class System(PofBase):
         for comp in self.comp.values():
             comp.increment_counter()
 
+    def n_failures(self):
+        """ Returns the number of functional failures simulated since the last reset"""
+        return sum(comp.n_failures() for comp in self.comp.values())
+
     def save_timeline(self, idx):
         """ Saves the timeline for each component """
         for comp in self.comp.values():
             comp.save_timeline(idx)
 
+    def merge_sim(self, other):
+        """ Merges the simulation results from another copy of this system """
+        for comp_name, comp in self.comp.items():
+            comp.merge_sim(other.comp[comp_name])
+
+        self._sim_counter += other._sim_counter
+
     # ****************** Progress *******************
 
     def progress(self) -> float:
@@ -223,74 +334,70 @@ class System(PofBase):
 
     # ****************** Reports ****************
 
-    def expected_risk_cost_df(self, t_start=0, t_end=None):
-        """ Create df_erc for all components """
+    def _comp_reports(self, build) -> pd.DataFrame:
+        """ Builds a report for each active component and concatenates them once """
 
-        # Create the dataframe
-        df = pd.DataFrame()
+        comps = [comp for comp in self.comp.values() if comp.active]
 
-        # Append the values for each component to the dataframe
-        for comp in self.comp.values():
-            if comp.active:
-                df_comp = comp.expected_risk_cost_df(t_start=t_start, t_end=t_end)
-                df_comp["comp"] = comp.name
+        def comp_report(comp):
+            df_comp = build(comp)
+            df_comp["comp"] = comp.name
+            return df_comp
 
-                df = df.append(df_comp)
+        # Most of the work is in numpy so the components can be built concurrently
+        n_threads = min(cf.get("report_threads", 4), len(comps))
+        if n_threads > 1:
+            with ThreadPoolExecutor(max_workers=n_threads) as executor:
+                frames = list(executor.map(comp_report, comps))
+        else:
+            frames = [comp_report(comp) for comp in comps]
 
-        self.df_erc = df
+        if not frames:
+            return pd.DataFrame()
 
-        return self.df_erc
+        df = pd.concat(frames)
 
-    def calc_pof_df(self, t_end=None):
-        """ Create df_pof for all components """
+        # Store the repeated labels as categories
+        for column in REPORT_CATEGORIES:
+            if column in df:
+                categories = union_categoricals(
+                    [pd.Categorical(frame[column]) for frame in frames]
+                ).categories
+                df[column] = pd.Categorical(df[column], categories=categories)
 
-        # Create the dataframe
-        df = pd.DataFrame()
-
-        # Append the values for each component to the dataframe
-        for comp in self.comp.values():
-            if comp.active:
-                df_comp = comp.calc_pof_df(t_end=t_end)
-                df_comp["comp"] = comp.name
+        return df
 
-                df = df.append(df_comp)
+    def expected_risk_cost_df(self, t_start=0, t_end=None):
+        """ Create df_erc for all components """
 
-        self.df_pof = df
+        self.df_erc = self._comp_reports(
+            lambda comp: comp.expected_risk_cost_df(t_start=t_start, t_end=t_end)
+        )
 
-    def calc_df_task_forecast(self, df_age_forecast, age_units="years"):
-        """ Create df_task for all components """
+        return self.df_erc
 
-        # Create the dataframe
-        df = pd.DataFrame()
+    def calc_pof_df(self, t_end=None):
+        """ Create df_pof for all components """
 
-        # Append the values for each component to the dataframe
-        for comp in self.comp.values():
-            if comp.active:
-                df_comp = comp.calc_df_task_forecast(
-                    df_age_forecast=df_age_forecast,
-                    age_units=age_units,
-                )
-                df_comp["comp"] = comp.name
+        self.df_pof = self._comp_reports(lambda comp: comp.calc_pof_df(t_end=t_end))
 
-                df = df.append(df_comp)
+    def calc_df_task_forecast(self, df_age_forecast, age_units="years"):
+        """ Create df_task for all components """
 
-        self.df_task = df
+        # Each component gets its own copy as the forecast is modified in place
+        self.df_task = self._comp_reports(
+            lambda comp: comp.calc_df_task_forecast(
+                df_age_forecast=df_age_forecast.copy(),
+                age_units=age_units,
+            )
+        )
 
     def calc_df_cond(self, t_start=0, t_end=None):
         """ Create df_cond for all components """
 
-        # Create the dataframe
-        df = pd.DataFrame()
-
-        # Append the values for each component to the dataframe
-        for comp in self.comp.values():
-            if comp.active:
-                df_comp = comp.calc_df_cond(t_start=t_start, t_end=t_end)
-                df_comp["comp"] = comp.name
-
-                df = df.append(df_comp)
-
-        self.df_cond = df
+        self.df_cond = self._comp_reports(
+            lambda comp: comp.calc_df_cond(t_start=t_start, t_end=t_end)
+        )
 
     def expected_condition(self):
         """ Create expected condition for all components """
@@ -343,7 +450,9 @@ class System(PofBase):
                 df_rc = self.expected_risk_cost_df()
 
                 # Summarise outputs
-                df_rc = df_rc.groupby(by=["comp", "task", "active"])[cols].max()
+                df_rc = df_rc.groupby(by=["comp", "task", "active"], observed=True)[
+                    cols
+                ].max()
                 df_rc[var] = i
 
                 rc[i] = df_rc
@@ -393,6 +502,7 @@ class System(PofBase):
 
         # Reset counters
         self._sim_counter = 0
+        self.reset_convergence()
         self.stop_simulation = False
 
         # Reset stored reports
@@ -5,9 +5,9 @@ Author: Gavin Treseder
 
 # ************ Packages ********************
 
+import functools
 import logging
 import math
-from random import random, seed
 from typing import List
 
 import numpy as np
@@ -25,14 +25,14 @@ import pof.demo as demo
 from pof.distribution import Distribution
 from pof.helper import flatten, str_to_dict
 from pof.pof_base import PofBase
+from pof.timeline_store import unique_events
+from pof.trigger import TriggerPredicate
 
 # TODO move t somewhere else
 # TODO create better constructors https://stackoverflow.com/questions/682504/what-is-a-clean-pythonic-way-to-have-multiple-constructors-in-python
 # TODO create set trigger and set impact method that doesn't overwrite other dicts
 # TODO replace trigger with has_trigger_time
 
-seed(1)
-
 # from dataclasses import dataclass
 
 
@@ -46,6 +46,11 @@ class Task(PofBase):
     TIME_VARIABLES = []
     POF_VARIABLES = []
 
+    UNCOMPARED_VARIABLES = PofBase.UNCOMPARED_VARIABLES + ["_predicate"]
+
+    # The triggers compiled into a predicate, set when it is first used and cleared when the triggers change
+    _predicate = None
+
     def __init__(
         self,
         name="task",
@@ -177,6 +182,26 @@ class Task(PofBase):
                 triggers["state"][state] = bool(triggers["state"][state])
 
         self.triggers = triggers
+        self._predicate = None
+
+    @property
+    def trigger_predicate(self):
+        """ Returns the predicate that checks if the state triggers and any of the condition triggers are met"""
+        if self._predicate is None:
+            self._predicate = TriggerPredicate(
+                states=self.triggers.get("state"),
+                conditions=self.triggers.get("condition"),
+                state_logic="and",
+                condition_logic="or",
+            )
+
+        return self._predicate
+
+    def update_from_dict(self, data):
+        super().update_from_dict(data)
+
+        if "triggers" in data:
+            self._predicate = None
 
     def set_impacts(self, impacts=None):
         if impacts is None:
@@ -232,26 +257,26 @@ class Task(PofBase):
 
     def is_effective(self, t_now=None, timeline=None):
 
-        return random() <= self.p_effective
+        return self.sample_uniform() <= self.p_effective
 
     # ********************* expected methods ******************
 
     def expected(self, scaling=1) -> dict:
         """ Retuns a dictionary with the quantity and cost of completing a task over time scaled by a scaling factor"""
-        time, count = np.unique(self.t_completion, return_counts=True)
+        time, count = unique_events(self.t_completion)
         quantity = count / scaling
         cost = quantity * self.cost
         return {"active": self.active, "time": time, "quantity": quantity, "cost": cost}
 
     def expected_costs(self, scaling=1):
         """ Retuns a dictionary with the cost of completing a task over time scaled by a scaling factor"""
-        time, cost = np.unique(self.t_completion, return_counts=True)
+        time, cost = unique_events(self.t_completion)
         cost = cost / scaling * self.cost
         return dict(active=self.active, time=time, cost=cost)
 
     def expected_quantity(self, scaling=1):
         """ Retuns a dictionary with the number of times a task was completed scaled by a scaling factor"""
-        time, count = np.unique(self.t_completion, return_counts=True)
+        time, count = unique_events(self.t_completion)
         quantity = count / scaling
         return dict(time=time, quantity=quantity)
 
@@ -308,13 +333,22 @@ class Task(PofBase):
         """
         Record the details when a task is completed
         """
+        self.record_many([t_complete])
+
+        # TODO add other modules Resource, Labour, availability,
+
+    def record_many(self, t_complete):
+        """
+        Record the details when a task is completed at each of the times
+        """
         # Time
-        self.t_completion.append(t_complete)
+        self.t_completion.extend(t_complete)
 
         # Cost TODO make this variable based on time to failure
-        self.cost_completion.append(self.cost)
-
-        # TODO add other modules Resource, Labour, availability,
+        if self.keep_timelines:
+            self.cost_completion.extend([self.cost] * len(t_complete))
+        else:
+            self.cost_completion.extend(t_complete, weights=self.cost)
 
     # ********************* reset methods ******************
 
@@ -322,8 +356,8 @@ class Task(PofBase):
         """
         Resets the logs for a task
         """
-        self.t_completion = []
-        self.cost_completion = []
+        self.t_completion = self._new_events()
+        self.cost_completion = self._new_events()
 
     # ********************* interface methods ******************
 
@@ -362,6 +396,21 @@ class Task(PofBase):
     # TODO add methods for cost, resources and
 
 
+@functools.lru_cache(maxsize=cf["Task"].get("schedule_cache_size", 256))
+def schedule_countdown(t_interval, t_delay, t_end):
+    """
+    Returns the time until the next scheduled task for each time step from 0 to t_end. The task is first due at
+    t_delay and then every t_interval. Schedules are cached and shared by every task so the array is read-only
+    """
+    t = np.arange(t_end + 1)
+    t_first = min(t_delay, t_end) if t_delay > 0 else -1
+
+    schedule = np.where(t <= t_first, t_first - t, (t_first - t) % t_interval).astype(float)
+    schedule.flags.writeable = False
+
+    return schedule
+
+
 class ScheduledTask(Task):  # TODO currenlty set up as emergency replacement
     """
     Parent class for creating scheduled tasks
@@ -423,6 +472,9 @@ class ScheduledTask(Task):  # TODO currenlty set up as emergency replacement
         t_interval = int(self._t_interval)
         t_delay = int(self._t_delay)
 
+        if t_interval > 0 and t_start >= 0 and t_end >= 0:
+            return schedule_countdown(t_interval, t_delay, t_end)[t_start:]
+
         if t_interval == 0:
             n_tiles = max((t_end - t_delay), 0)
             tile = [0]
@@ -444,12 +496,50 @@ class ScheduledTask(Task):  # TODO currenlty set up as emergency replacement
 
         return schedule
 
+    def next_due(self, t, t_end):
+        """ Returns the first time on or after t that the task is due or None if it isn't due before t_end"""
+        if not self.active or t > t_end:
+            return None
+
+        t_interval = int(self._t_interval)
+        t_delay = int(self._t_delay)
+
+        if t_interval == 0:
+            due = self.sim_timeline(t_end=t_end, t_start=t) == 0
+            return t + int(np.argmax(due)) if due.any() else None
+
+        t_first = min(t_delay, t_end) if t_delay > 0 else -1
+
+        if t <= t_first:
+            return t_first
+
+        t_due = t + (t_first - t) % t_interval
+
+        return t_due if t_due <= t_end else None
+
     @classmethod
     def demo(cls):
         # TODO make this a scheduled replacement task
         return cls.from_dict(demo.inspection_data["degrading"])
 
 
+def next_maintenance(triggered):
+    """
+    Returns the time until the task is completed at the next maintenance for the first window the task is triggered.
+    Later windows are marked with 1 and every other time step with -1
+    """
+    tl_ct = np.where(triggered, 1, -1)
+
+    t_lower = int(np.argmax(triggered))
+    t_upper = t_lower + int(np.argmax(~triggered[t_lower:]))
+
+    if t_upper > t_lower:
+        tl_ct[t_lower : t_upper - 1] = np.arange(t_upper - t_lower - 1, 0, -1)
+        tl_ct[t_upper - 1] = -1
+
+    return tl_ct
+
+
 class ConditionTask(Task):
     """
     Parent class for creating condition tasks
@@ -472,41 +562,34 @@ class ConditionTask(Task):
         If state and any condition triggers are met return the timeline met
         """
 
-        t_end = t_end + 1
-        s_trigger = np.full(t_end - t_start, True)
-        c_trigger = not self.triggers["condition"]
-
-        # Check the state triggers have been met
-        for state, trigger in self.triggers["state"].items():
-            s_trigger = (s_trigger) & (timeline[state][t_start:t_end] == trigger)
-
-        # Check the condition triggers have been met
-        for condition, trigger in self.triggers["condition"].items():
-
-            tl_condition = indicators[condition].get_timeline()[t_start:]
-            lower = True
-            upper = True
+        conditions = dict()
+        monotone = []
 
-            if (trigger["lower"] != "min") and (trigger["lower"] is not None):
-                lower = tl_condition >= trigger["lower"]
+        for condition in self.triggers["condition"]:
+            indicator = indicators[condition]
+            conditions[condition] = indicator.get_timeline()
 
-            if (trigger["upper"] != "max") and (trigger["upper"] is not None):
-                upper = tl_condition <= trigger["upper"]
+            # The trigger is met for a single window if the condition only falls
+            t_monotone = indicator.monotone_from()
+            if t_monotone is not None and t_monotone <= t_start:
+                monotone.append(condition)
 
-            c_trigger = c_trigger | (lower & upper)
-
-        tl_ct = (s_trigger & c_trigger).astype(int)
+        triggered = self.trigger_predicate(
+            timeline,
+            t_start=t_start,
+            t_end=t_end + 1,
+            conditions=conditions,
+            monotone=monotone,
+        )
 
         if self.task_completion == "next_maintenance":
-            # Change to days until format #Adjust
-            t_lower = np.argmax(tl_ct == 1)
-            t_upper = t_lower + np.argmax(tl_ct[t_lower:] == 0)
-
-            tl_ct[t_lower:t_upper] = tl_ct[t_lower:t_upper].cumsum()[::-1] - 1
-            tl_ct[tl_ct == False] = -1
+            tl_ct = next_maintenance(triggered)
 
         elif self.task_completion == "immediate":
-            tl_ct = tl_ct - 1
+            tl_ct = np.where(triggered, 0, -1)
+
+        else:
+            tl_ct = triggered.astype(int)
 
         return tl_ct
 
@@ -528,38 +611,20 @@ class Inspection(ScheduledTask):
             name=name, t_interval=t_interval, t_delay=t_delay, *args, **kwargs
         )
 
-    # TODO replace is_effective with trigger check
     def is_effective(self, t_now, timeline=None):
         """
         Simulate the completion of an inspection. Checks conditions and states are met
         """
 
-        # Check if any state criteria have been met
+        # Nothing to detect if it has already been detected
         if timeline["detection"][t_now] == True:
-            det = True
-        else:
-            det = False
-
-            if random() <= self.p_effective:
-
-                for trigger, threshold in self.triggers["state"].items():
-                    det = det or timeline[trigger][t_now] == threshold
-
-                # Check if any conditions are within detection threshold
-                if det == True:
-                    for trigger, threshold in self.triggers["condition"].items():
-                        if trigger in timeline:  # TODO get more efficient check
-                            if threshold["lower"] != "min":
-                                det = (det) & (
-                                    timeline[trigger][t_now] >= threshold["lower"]
-                                )
+            return True
 
-                            if threshold["upper"] != "max":
-                                det = det | (
-                                    timeline[trigger][t_now] <= threshold["upper"]
-                                )
+        # Check the state triggers and any of the condition triggers are met at t_now
+        if self.sample_uniform() <= self.p_effective:
+            return bool(self.trigger_predicate(timeline, t_start=t_now, t_end=t_now + 1)[0])
 
-        return det
+        return False
 
     def effectiveness(self, pf_interval, failure_dist: Distribution = None):
 
@@ -0,0 +1,680 @@
+""" A columnar store for simulated timelines
+
+The TimelineStore keeps one preallocated (n_iterations, t) array per timeline key using a compact dtype and behaves
+like a dictionary of {idx: {key: timeline}} when it is read one iteration at a time
+
+"""
+
+import numpy as np
+
+INT_DTYPES = [np.int16, np.int32, np.int64]
+
+
+def compact_dtype(values):
+    """ Returns the smallest dtype from bool, int16/32/64 and float32 that can hold the values"""
+    values = np.asarray(values)
+
+    if values.dtype == bool:
+        return np.dtype(bool)
+
+    if np.issubdtype(values.dtype, np.integer):
+        if values.size == 0:
+            return np.dtype(INT_DTYPES[0])
+
+        v_min = values.min()
+        v_max = values.max()
+        for dtype in INT_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= v_min and v_max <= info.max:
+                return np.dtype(dtype)
+
+    return np.dtype(np.float32)
+
+
+class TimelineStore:
+    """
+    Stores a timeline for each iteration in preallocated columns that grow as they fill up. Timelines can be different
+    lengths and are padded with zeros
+    """
+
+    def __init__(self, capacity=0):
+        self._capacity = capacity
+        self._width = 0
+        self._rows = dict()  # idx -> row
+        self._columns = dict()  # key -> (capacity, width) array
+        self._lengths = dict()  # key -> (capacity, ) array of lengths, -1 if the row doesn't have the key
+
+    def __eq__(self, other):
+        if not isinstance(other, TimelineStore):
+            return False
+
+        if list(self._rows) != list(other._rows) or set(self._columns) != set(
+            other._columns
+        ):
+            return False
+
+        return all(
+            np.array_equal(self.lengths(key), other.lengths(key))
+            and np.array_equal(
+                self.stack(key, padded=True), other.stack(key, padded=True)
+            )
+            for key in self._columns
+        )
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __contains__(self, idx):
+        return idx in self._rows
+
+    def __getitem__(self, idx):
+        """ Returns a dictionary with a read only view of each timeline for an iteration"""
+        row = self._rows[idx]
+
+        timeline = dict()
+        for key, column in self._columns.items():
+            length = self._lengths[key][row]
+            if length >= 0:
+                view = column[row, :length]
+                view.flags.writeable = False
+                timeline[key] = view
+
+        return timeline
+
+    def __setitem__(self, idx, timeline):
+        self.save(idx, timeline)
+
+    def keys(self):
+        return self._rows.keys()
+
+    def values(self):
+        return (self[idx] for idx in self._rows)
+
+    def items(self):
+        return ((idx, self[idx]) for idx in self._rows)
+
+    @property
+    def columns(self):
+        """ The timeline keys that have been saved"""
+        return list(self._columns)
+
+    # ****************** Write ******************
+
+    def reserve(self, n_iterations, width=None):
+        """ Preallocates space for n_iterations rows"""
+        self._grow(capacity=n_iterations, width=width or self._width)
+
+    def save(self, idx, timeline):
+        """ Saves a dictionary of timelines for an iteration"""
+        row = self._row(idx)
+
+        for key, values in timeline.items():
+            values = np.asarray(values)
+            length = len(values)
+
+            self._column(key, values, width=length)[row, :length] = values
+            self._columns[key][row, length:] = 0
+            self._lengths[key][row] = length
+
+    def save_many(self, idx_start, timelines, lengths=None):
+        """
+        Saves a batch of iterations where each key has an (n_iterations, t) array and lengths is an optional array with
+        the number of increments to keep for each iteration
+        """
+        n = len(next(iter(timelines.values()))) if timelines else 0
+        rows = np.array([self._row(idx_start + i) for i in range(n)], dtype=int)
+
+        for key, values in timelines.items():
+            values = np.asarray(values)
+            width = values.shape[1]
+            column = self._column(key, values, width=width)
+
+            if lengths is None:
+                column[rows, :width] = values
+                column[rows, width:] = 0
+                self._lengths[key][rows] = width
+            else:
+                # Zero anything after the end of each timeline
+                keep = np.arange(width) < np.asarray(lengths)[:, np.newaxis]
+                column[rows, :width] = np.where(keep, values, 0)
+                column[rows, width:] = 0
+                self._lengths[key][rows] = lengths
+
+    def merge(self, other, offset=0):
+        """ Copies the iterations from another store with their idx shifted by offset"""
+        for idx in other:
+            self.save(offset + idx, other[idx])
+
+    def _row(self, idx):
+        """ Returns the row for an idx and adds a new row if it doesn't exist"""
+        if idx not in self._rows:
+            row = len(self._rows)
+            if row >= self._capacity:
+                self._grow(capacity=max(2 * self._capacity, 16), width=self._width)
+            self._rows[idx] = row
+
+        return self._rows[idx]
+
+    def _column(self, key, values, width):
+        """ Returns the column for a key, creating or upcasting it so it can hold the values"""
+        if width > self._width:
+            self._grow(capacity=self._capacity, width=width)
+
+        column = self._columns.get(key)
+        dtype = compact_dtype(values)
+
+        if column is None:
+            column = np.zeros((self._capacity, self._width), dtype=dtype)
+            self._lengths[key] = np.full(self._capacity, -1)
+        elif np.promote_types(column.dtype, dtype) != column.dtype:
+            column = column.astype(np.promote_types(column.dtype, dtype))
+
+        self._columns[key] = column
+        return column
+
+    def _grow(self, capacity, width):
+        """ Reallocates the columns if the capacity or width has increased"""
+        capacity = max(capacity, self._capacity)
+        width = max(width, self._width)
+
+        if capacity == self._capacity and width == self._width:
+            return
+
+        for key, column in self._columns.items():
+            new_column = np.zeros((capacity, width), dtype=column.dtype)
+            new_column[: self._capacity, : self._width] = column
+            self._columns[key] = new_column
+
+            lengths = np.full(capacity, -1)
+            lengths[: self._capacity] = self._lengths[key]
+            self._lengths[key] = lengths
+
+        self._capacity = capacity
+        self._width = width
+
+    # ****************** Read ******************
+
+    def stack(self, key, padded=False):
+        """
+        Returns an (n_iterations, t) view of the timelines for a key in the order they were saved. Raises a ValueError
+        if the timelines are different lengths unless padded is True
+        """
+        rows = list(self._rows.values())
+        column = self._columns[key][: len(rows)]
+        row_lengths = self._lengths[key][: len(rows)]
+
+        if padded:
+            return column
+
+        if len(rows) == 0:
+            return column[:, :0]
+
+        length = row_lengths.max()
+        if row_lengths.min() != length:
+            raise ValueError("Timelines for %s are different lengths" % (key))
+
+        return column[:, :length]
+
+    def lengths(self, key):
+        """ Returns the length of the timeline for each iteration"""
+        return self._lengths[key][: len(self._rows)]
+
+    def first_event_times(self, key, time_key="time"):
+        """
+        Returns the time of the first event for each iteration, or the last time if there wasn't an event, and whether
+        the event was observed
+        """
+        events = self.stack(key, padded=True)
+        times = self.stack(time_key, padded=True)
+        rows = np.arange(len(events))
+
+        observed = events.any(axis=1)
+        t_first = times[rows, events.argmax(axis=1)]
+        t_last = times[rows, self.lengths(time_key) - 1]
+
+        return np.where(observed, t_first, t_last), observed
+
+    def mean(self, key):
+        return self.stack(key).mean(axis=0, dtype=np.float64)
+
+    def std(self, key):
+        return self.stack(key).std(axis=0, dtype=np.float64)
+
+    def percentile(self, key, q):
+        return np.percentile(self.stack(key), q, axis=0)
+
+
+class EventHistogram:
+    """
+    Counts the events at each time step with np.bincount instead of keeping a list of the event times. Each event can
+    have a weight, such as the cost of completing a task, that is summed for each time step
+    """
+
+    def __init__(self):
+        self._count = np.zeros(0, dtype=int)
+        self._total = np.zeros(0)
+
+    def __eq__(self, other):
+        if not isinstance(other, EventHistogram):
+            return False
+
+        return all(
+            np.array_equal(np.trim_zeros(mine, "b"), np.trim_zeros(theirs, "b"))
+            for mine, theirs in [(self._count, other._count), (self._total, other._total)]
+        )
+
+    def __len__(self):
+        return int(self._count.sum())
+
+    def append(self, t, weight=1):
+        """ Adds an event at time t"""
+        self._grow(t + 1)
+        self._count[t] += 1
+        self._total[t] += weight
+
+    def extend(self, events, weights=1):
+        """ Adds the events at each time in a list or the events in another histogram"""
+        if isinstance(events, EventHistogram):
+            count, total = events._count, events._total
+        else:
+            t = np.asarray(events, dtype=int)
+            if t.size == 0:
+                return
+            count = np.bincount(t)
+            total = np.bincount(t, weights=np.broadcast_to(weights, t.shape))
+
+        self._grow(len(count))
+        self._count[: len(count)] += count
+        self._total[: len(total)] += total
+
+    def _grow(self, width):
+        extra = width - len(self._count)
+        if extra > 0:
+            self._count = np.concatenate([self._count, np.zeros(extra, dtype=int)])
+            self._total = np.concatenate([self._total, np.zeros(extra)])
+
+    def counts(self, minlength=0):
+        """ Returns the number of events at each time step"""
+        return np.pad(self._count, (0, max(minlength - len(self._count), 0)))
+
+    def totals(self, minlength=0):
+        """ Returns the sum of the weights at each time step"""
+        return np.pad(self._total, (0, max(minlength - len(self._total), 0)))
+
+    def sum(self):
+        """ Returns the sum of the event times"""
+        return int(np.dot(np.arange(len(self._count)), self._count))
+
+    def unique(self):
+        """ Returns the times with an event and the number of events at each time like np.unique"""
+        time = np.flatnonzero(self._count)
+        return time, self._count[time]
+
+
+def unique_events(events):
+    """ Returns the times with an event and the number of events at each time from a list or an EventHistogram"""
+    if isinstance(events, EventHistogram):
+        return events.unique()
+    return np.unique(events, return_counts=True)
+
+
+def event_counts(events, minlength=0):
+    """ Returns the number of events at each time step from a list or an EventHistogram"""
+    if isinstance(events, EventHistogram):
+        return events.counts(minlength)
+    return np.bincount(np.asarray(events, dtype=int), minlength=minlength)
+
+
+def sum_events(events):
+    """ Returns the sum of the event times from a list or an EventHistogram"""
+    return events.sum() if isinstance(events, EventHistogram) else sum(events)
+
+
+class P2Quantile:
+    """
+    Estimates a quantile for each time step without storing the observations using the P-square algorithm
+    (Jain & Chlamtac, 1985). Each time step has five markers that are updated as the observations arrive
+    """
+
+    def __init__(self, p, width=0):
+        self.p = p
+        self._dn = np.array([0, p / 2, p, (1 + p) / 2, 1])
+        self._q = np.zeros((5, width))  # marker heights
+        self._n = np.tile(np.arange(5, dtype=float)[:, np.newaxis], (1, width))
+        self._np = np.tile((4 * self._dn)[:, np.newaxis], (1, width))
+        self._count = np.zeros(width, dtype=int)
+
+    @classmethod
+    def from_block(cls, p, block):
+        """
+        Returns an estimator with its markers at the exact quantiles of a block of observations for each time step. The
+        block is an (n, width) array padded with nan where an observation didn't reach a time step
+        """
+        block = np.sort(block, axis=0)  # nan is sorted to the end
+        count = (~np.isnan(block)).sum(axis=0)
+        estimator = cls(p, width=block.shape[1])
+        estimator._count = count
+
+        # Keep the observations where there are less than five
+        n_rows = min(5, len(block))
+        estimator._q[:n_rows] = np.nan_to_num(block[:n_rows])
+
+        # Place the markers at the minimum, p/2, p, (1 + p)/2 quantiles and the maximum
+        started = count >= 5
+        position = estimator._dn[:, np.newaxis] * (count[started] - 1)
+        lower = np.floor(position).astype(int)
+        upper = np.ceil(position).astype(int)
+        q_lower = np.take_along_axis(block[:, started], lower, axis=0)
+        q_upper = np.take_along_axis(block[:, started], upper, axis=0)
+
+        estimator._q[:, started] = q_lower + (position - lower) * (q_upper - q_lower)
+        estimator._n[:, started] = position
+        estimator._np[:, started] = position
+
+        return estimator
+
+    def _grow(self, width):
+        extra = width - len(self._count)
+        if extra > 0:
+            self._q = np.concatenate([self._q, np.zeros((5, extra))], axis=1)
+            self._n = np.concatenate(
+                [self._n, np.tile(np.arange(5, dtype=float)[:, np.newaxis], (1, extra))],
+                axis=1,
+            )
+            self._np = np.concatenate(
+                [self._np, np.tile((4 * self._dn)[:, np.newaxis], (1, extra))], axis=1
+            )
+            self._count = np.concatenate([self._count, np.zeros(extra, dtype=int)])
+
+    def update(self, x):
+        """ Adds an observation for the first len(x) time steps"""
+        x = np.asarray(x, dtype=float)
+        width = len(x)
+        self._grow(width)
+
+        cols = np.arange(width)
+        count = self._count[:width]
+
+        # Store the first five observations and sort them to start the markers
+        init = count < 5
+        if init.any():
+            self._q[count[init], cols[init]] = x[init]
+            started = cols[init][count[init] == 4]
+            self._q[:, started] = np.sort(self._q[:, started], axis=0)
+
+        upd = cols[~init]
+        if len(upd) > 0:
+            self._update_markers(upd, x[upd])
+
+        self._count[:width] += 1
+
+    def _update_markers(self, cols, x):
+        q = self._q[:, cols]
+        n = self._n[:, cols]
+        n_desired = self._np[:, cols]
+
+        # Find the cell the observation falls in and adjust the extreme markers
+        q[0] = np.minimum(q[0], x)
+        q[4] = np.maximum(q[4], x)
+        k = np.clip((x[np.newaxis, :] >= q[1:4]).sum(axis=0), 0, 3)
+
+        n[1:] += np.arange(1, 5)[:, np.newaxis] > k[np.newaxis, :]
+        n_desired += self._dn[:, np.newaxis]
+
+        # Adjust the middle markers if they are off their desired positions
+        for i in range(1, 4):
+            d = n_desired[i] - n[i]
+            adjust = ((d >= 1) & (n[i + 1] - n[i] > 1)) | (
+                (d <= -1) & (n[i - 1] - n[i] < -1)
+            )
+            if not adjust.any():
+                continue
+
+            d = np.sign(d[adjust])
+            qi, qm, qp = q[i, adjust], q[i - 1, adjust], q[i + 1, adjust]
+            ni, nm, np_ = n[i, adjust], n[i - 1, adjust], n[i + 1, adjust]
+
+            parabolic = qi + d / (np_ - nm) * (
+                (ni - nm + d) * (qp - qi) / (np_ - ni)
+                + (np_ - ni - d) * (qi - qm) / (ni - nm)
+            )
+            linear = qi + d * (
+                np.where(d > 0, qp, qm) - qi
+            ) / np.where(d > 0, np_ - ni, nm - ni)
+            use_parabolic = (qm < parabolic) & (parabolic < qp)
+
+            q[i, adjust] = np.where(use_parabolic, parabolic, linear)
+            n[i, adjust] = ni + d
+
+        self._q[:, cols] = q
+        self._n[:, cols] = n
+        self._np[:, cols] = n_desired
+
+    def merge(self, other):
+        """ Approximately combines the estimates from another estimator by weighting the markers by the counts"""
+        width = max(len(self._count), len(other._count))
+        self._grow(width)
+        other._grow(width)
+
+        both = (self._count >= 5) & (other._count >= 5)
+        w = self._count[both] / (self._count[both] + other._count[both])
+        self._q[:, both] = w * self._q[:, both] + (1 - w) * other._q[:, both]
+
+        # Use the other estimate where this one hasn't started
+        take = (self._count < 5) & (other._count >= 5)
+        self._q[:, take] = other._q[:, take]
+        self._n[:, take] = other._n[:, take]
+        self._np[:, take] = other._np[:, take]
+
+        # Combine the observations where neither has started
+        for col in np.flatnonzero((self._count < 5) & (other._count < 5) & (other._count > 0)):
+            values = np.concatenate(
+                [self._q[: self._count[col], col], other._q[: other._count[col], col]]
+            )
+            if len(values) < 5:
+                self._q[: len(values), col] = values
+            else:
+                started = P2Quantile.from_block(self.p, values[:, np.newaxis])
+                self._q[:, col] = started._q[:, 0]
+                self._n[:, col] = started._n[:, 0]
+                self._np[:, col] = started._np[:, 0]
+
+        self._count = self._count + other._count
+
+    def value(self):
+        """ Returns the quantile estimate for each time step"""
+        quantile = self._q[2].copy()
+
+        # Use the exact quantile for time steps with less than five observations
+        for col in np.flatnonzero(self._count < 5):
+            count = self._count[col]
+            if count == 0:
+                quantile[col] = np.nan
+            else:
+                quantile[col] = np.percentile(self._q[:count, col], self.p * 100)
+
+        return quantile
+
+
+class TimelineSummary:
+    """
+    Summarises the timelines for each iteration without keeping them. Keeps a running mean and variance (Welford),
+    estimates of the 10th and 90th percentiles (P-square) and a histogram of the first event for boolean timelines.
+    The percentiles are updated with the exact percentiles of each block of block_size iterations
+    """
+
+    def __init__(self, quantiles=(10, 90), block_size=256):
+        self._n = 0
+        self._idx = set()
+        self._count = dict()
+        self._mean = dict()
+        self._m2 = dict()
+        self._quantiles = dict()
+        self.quantiles = quantiles
+        self.block_size = block_size
+        self._block = dict()
+        self._first = dict()
+        self._censored = dict()
+
+    def __eq__(self, other):
+        if not isinstance(other, TimelineSummary):
+            return False
+
+        return self._n == other._n and all(
+            np.array_equal(self._mean[key], other._mean.get(key)) for key in self._mean
+        )
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def columns(self):
+        """ The timeline keys that have been saved"""
+        return list(self._mean)
+
+    # ****************** Write ******************
+
+    def reserve(self, n_iterations, width=None):
+        """ Nothing is preallocated because the summary doesn't grow with the iterations"""
+        return
+
+    def save(self, idx, timeline):
+        """ Updates the summary with a dictionary of timelines for an iteration"""
+        self._idx.add(idx)
+        self._n = len(self._idx)
+
+        for key, values in timeline.items():
+            values = np.asarray(values)
+            length = len(values)
+            self._grow(key, length, values.dtype == bool)
+
+            # Welford's online mean and variance
+            x = values.astype(float)
+            count = self._count[key][:length] + 1
+            delta = x - self._mean[key][:length]
+            self._mean[key][:length] += delta / count
+            self._m2[key][:length] += delta * (x - self._mean[key][:length])
+            self._count[key][:length] = count
+
+            self._block[key].append(x)
+            if len(self._block[key]) >= self.block_size:
+                self._flush(key)
+
+            # Time of the first event or the end of the timeline if there wasn't an event
+            if key in self._first:
+                if values.any():
+                    self._first[key][np.argmax(values)] += 1
+                elif length > 0:
+                    self._censored[key][length - 1] += 1
+
+    def __setitem__(self, idx, timeline):
+        self.save(idx, timeline)
+
+    def save_many(self, idx_start, timelines, lengths=None):
+        """ Updates the summary with a batch of iterations where each key has an (n_iterations, t) array"""
+        n = len(next(iter(timelines.values()))) if timelines else 0
+        for i in range(n):
+            length = None if lengths is None else lengths[i]
+            self.save(
+                idx_start + i, {key: tl[i, :length] for key, tl in timelines.items()}
+            )
+
+    def merge(self, other, offset=0):
+        """ Combines the summary from another set of iterations"""
+        self._idx.update(offset + idx for idx in other._idx)
+        self._n = len(self._idx)
+
+        for key in other._mean:
+            width = len(other._mean[key])
+            self._grow(key, width, key in other._first)
+
+            # Chan's parallel combination of the mean and variance
+            n_a = self._count[key][:width]
+            n_b = other._count[key]
+            total = n_a + n_b
+            with np.errstate(divide="ignore", invalid="ignore"):
+                delta = other._mean[key] - self._mean[key][:width]
+                ratio = np.where(total > 0, n_b / total, 0)
+                self._mean[key][:width] += delta * ratio
+                self._m2[key][:width] += other._m2[key] + delta ** 2 * n_a * ratio
+            self._count[key][:width] = total
+
+            for q, estimator in self._quantiles[key].items():
+                estimator.merge(other._quantiles[key][q])
+
+            self._block[key].extend(other._block[key])
+            if len(self._block[key]) >= self.block_size:
+                self._flush(key)
+
+            if key in other._first:
+                self._first[key][:width] += other._first[key]
+                self._censored[key][:width] += other._censored[key]
+
+    def _grow(self, key, width, is_bool):
+        """ Creates or extends the accumulators for a key"""
+        if key not in self._mean:
+            self._count[key] = np.zeros(0, dtype=int)
+            self._mean[key] = np.zeros(0)
+            self._m2[key] = np.zeros(0)
+            self._quantiles[key] = {q: P2Quantile(q / 100) for q in self.quantiles}
+            self._block[key] = []
+            if is_bool:
+                self._first[key] = np.zeros(0, dtype=int)
+                self._censored[key] = np.zeros(0, dtype=int)
+
+        extra = width - len(self._mean[key])
+        if extra > 0:
+            self._count[key] = np.concatenate([self._count[key], np.zeros(extra, dtype=int)])
+            self._mean[key] = np.concatenate([self._mean[key], np.zeros(extra)])
+            self._m2[key] = np.concatenate([self._m2[key], np.zeros(extra)])
+            if key in self._first:
+                self._first[key] = np.concatenate([self._first[key], np.zeros(extra, dtype=int)])
+                self._censored[key] = np.concatenate(
+                    [self._censored[key], np.zeros(extra, dtype=int)]
+                )
+
+    def _flush(self, key):
+        """ Merges the exact percentiles of the buffered block of iterations into the estimators"""
+        rows = self._block[key]
+        if not rows:
+            return
+
+        block = np.full((len(rows), max(len(row) for row in rows)), np.nan)
+        for i, row in enumerate(rows):
+            block[i, : len(row)] = row
+
+        for q, estimator in self._quantiles[key].items():
+            estimator.merge(P2Quantile.from_block(q / 100, block))
+
+        self._block[key] = []
+
+    # ****************** Read ******************
+
+    def stack(self, key, padded=False):
+        raise ValueError("Timelines for %s were summarised and not kept" % (key))
+
+    def count(self, key):
+        """ Returns the number of iterations that reached each time step"""
+        return self._count[key].copy()
+
+    def mean(self, key):
+        return self._mean[key].copy()
+
+    def std(self, key):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.sqrt(self._m2[key] / self._count[key])
+
+    def percentile(self, key, q):
+        if q not in self._quantiles[key]:
+            raise ValueError(
+                "Percentile %s is not summarised, only %s" % (q, list(self.quantiles))
+            )
+        self._flush(key)
+        return self._quantiles[key][q].value()
+
+    def first_events(self, key):
+        """ Returns the number of iterations with a first event and without an event that ended at each time step"""
+        return self._first[key].copy(), self._censored[key].copy()
@@ -40,6 +40,153 @@ True or
 """
 
 
+# The array operation used to combine triggers for each logic
+LOGIC = {"and": np.logical_and, "or": np.logical_or}
+
+
+def condition_window(timeline, lower=None, upper=None):
+    """
+    Returns the first and last (exclusive) time steps a non-increasing timeline is between lower and upper. The
+    crossing times are found with a binary search rather than checking every time step
+    """
+    ascending = timeline[::-1]
+    n = len(timeline)
+
+    t_first = 0 if upper is None else n - np.searchsorted(ascending, upper, side="right")
+    t_last = n if lower is None else n - np.searchsorted(ascending, lower, side="left")
+
+    return t_first, max(t_first, t_last)
+
+
+def _limit(value, unbounded):
+    """ Returns None if the condition limit doesn't restrict the condition"""
+    if value is None or (isinstance(value, str) and value == unbounded):
+        return None
+    return value
+
+
+class TriggerPredicate:
+    """
+    The states, conditions and logic of a trigger compiled once so a whole timeline, or an (n_iterations, t) batch of
+    timelines, can be checked with array operations
+    """
+
+    def __init__(
+        self,
+        states=None,
+        conditions=None,
+        state_logic="and",
+        condition_logic="and",
+        overall_logic="and",
+    ):
+        self.states = tuple((states or dict()).items())
+        self.conditions = tuple(
+            (name, _limit(limits.get("lower"), "min"), _limit(limits.get("upper"), "max"))
+            for name, limits in (conditions or dict()).items()
+        )
+
+        self._state_logic = LOGIC[state_logic]
+        self._condition_logic = LOGIC[condition_logic]
+        self._overall_logic = LOGIC[overall_logic]
+
+    def __call__(self, timeline, t_start=0, t_end=None, conditions=None, monotone=()):
+        """
+        Returns True for each time step the trigger is met. Conditions are taken from the timeline unless conditions
+        are provided and conditions that are named in monotone are non-increasing
+        """
+        if t_end is None:
+            t_end = len(timeline["time"])
+
+        triggered = self._combine(
+            self._overall_logic,
+            [
+                self._check_states(timeline, t_start, t_end),
+                self._check_conditions(
+                    timeline if conditions is None else conditions, t_start, t_end, monotone
+                ),
+            ],
+        )
+
+        return self._or_all(triggered, t_start, t_end)
+
+    def check_state(self, timeline, t_start=0, t_end=None):
+        """ Returns True for each time step the state triggers are met"""
+        if t_end is None:
+            t_end = len(timeline["time"])
+
+        return self._or_all(self._check_states(timeline, t_start, t_end), t_start, t_end)
+
+    def check_condition(self, timeline, t_start=0, t_end=None, monotone=()):
+        """ Returns True for each time step the condition triggers are met"""
+        if t_end is None:
+            t_end = len(timeline["time"])
+
+        triggered = self._check_conditions(timeline, t_start, t_end, monotone)
+
+        return self._or_all(triggered, t_start, t_end)
+
+    def _check_states(self, timeline, t_start, t_end):
+        return self._combine(
+            self._state_logic,
+            [timeline[state][..., t_start:t_end] == target for state, target in self.states],
+        )
+
+    def _check_conditions(self, timeline, t_start, t_end, monotone):
+        in_windows = []
+
+        for name, lower, upper in self.conditions:
+
+            # A condition without limits is always met
+            if lower is None and upper is None:
+                if self._condition_logic is np.logical_or:
+                    return None
+                continue
+
+            values = timeline[name][..., t_start:t_end]
+
+            if name in monotone and values.ndim == 1:
+                t_first, t_last = condition_window(values, lower=lower, upper=upper)
+                in_window = np.full(len(values), False)
+                in_window[t_first:t_last] = True
+
+            else:
+                checks = []
+                if lower is not None:
+                    checks.append(values >= lower)
+                if upper is not None:
+                    checks.append(values <= upper)
+                in_window = self._combine(np.logical_and, checks)
+
+            in_windows.append(in_window)
+
+        return self._combine(self._condition_logic, in_windows)
+
+    @staticmethod
+    def _combine(logic, checks):
+        """ Combines the checks in place, ignoring any that are None because they are always met"""
+        triggered = None
+
+        for check in checks:
+            if check is None:
+                continue
+
+            if triggered is None:
+                triggered = check
+            elif triggered.shape == check.shape:
+                logic(triggered, check, out=triggered)
+            else:
+                triggered = logic(triggered, check)
+
+        return triggered
+
+    @staticmethod
+    def _or_all(triggered, t_start, t_end):
+        """ Returns the triggered time steps or True for every time step if there is nothing to check"""
+        if triggered is None:
+            triggered = np.full(t_end - t_start, True)
+        return triggered
+
+
 class Trigger:
 
     """
@@ -78,6 +225,7 @@ class Trigger:
         self._condition_logic = self._is_valid_logic(condition_logic)
         self._state_logic = self._is_valid_logic(state_logic)
         self._overall_logic = self._is_valid_logic(overall_logic)
+        self._predicate = None
 
     def set_triggers_all(self, triggers):
 
@@ -88,6 +236,20 @@ class Trigger:
         self.times = times if times is not None else dict()
         self.states = states if states is not None else dict()
         self.conditions = conditions if conditions is not None else dict()
+        self._predicate = None
+
+    def compile(self):
+        """ Returns the predicate for the triggers and logic, which is kept until they are changed"""
+        if self._predicate is None:
+            self._predicate = TriggerPredicate(
+                states=self.states,
+                conditions=self.conditions,
+                state_logic=self._state_logic,
+                condition_logic=self._condition_logic,
+                overall_logic=self._overall_logic,
+            )
+
+        return self._predicate
 
     def check(self, timeline, t_start=0, t_end=None):
 
@@ -97,83 +259,18 @@ class Trigger:
         else:
             t_end = min(len(timeline["time"]), t_end)
 
-        # Check for state triggers
-        triggered = self.check_state(timeline, t_start, t_end)
-
-        # Check for condition triggers
-        triggered = triggered & self.check_condition(timeline, t_start, t_end)
-
-        return triggered
+        return self.compile()(timeline, t_start, t_end)
 
     def check_state(self, timeline, t_start, t_end):
 
-        # Initialise the trigger state
-        if bool(self.states):
-
-            # Create the the state logic
-            if self._state_logic == "or":
-                triggered = np.full(t_end - t_start, False)
-
-            elif self._state_logic == "and":
-                triggered = np.full(t_end - t_start, True)
-
-            try:
-                # Check the condition triggers have been met
-                for state, target in self.states.items():
-
-                    if self._state_logic == "and":
-
-                        triggered = (triggered) & (timeline[state] == target)
-
-                    elif self._state_logic == "or":
-
-                        triggered = (triggered) | (timeline[state] == target)
-
-            except KeyError:
-                logging.warning("%s not found", state)
-
-        else:
-
-            triggered = np.full(t_end - t_start, True)
-
-        return triggered
+        return self.compile().check_state(timeline, t_start, t_end)
 
     def check_condition(self, timeline, t_start, t_end):
         """
         Check if condition triggers have been met using a timeline
         """
 
-        # Check if there are condition triggers
-        if bool(self.conditions):
-
-            # Create the start state
-            if self._condition_logic == "and":
-                triggered = np.full(t_end - t_start, True)
-
-            elif self._condition_logic == "or":
-                triggered = np.full(t_end - t_start, False)
-
-            try:
-
-                for condition, trigger in self.conditions.items():
-
-                    in_condition_window = (
-                        timeline[condition][t_start:t_end] >= trigger["lower"]
-                    ) & (timeline[condition][t_start:t_end] <= trigger["upper"])
-
-                    if self._condition_logic == "and":
-                        triggered = (triggered) & (in_condition_window)
-
-                    elif self._condition_logic == "or":
-                        triggered = (triggered) | (in_condition_window)
-
-            except KeyError:
-                logging.warning("%s not found", condition)
-        else:
-            # No triggers to check so return true
-            triggered = np.full(t_end - t_start, True)
-
-        return triggered
+        return self.compile().check_condition(timeline, t_start, t_end)
 
     def check_value(self):  # TODO placeholder concept for @Stephen Fisher
 
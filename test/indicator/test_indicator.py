@@ -12,11 +12,18 @@ import copy
 from random import randint
 
 import numpy as np
+import scipy.stats as ss
 
 import fixtures
 import testconfig  # pylint: disable=unused-import
 from test_pof_base import TestPofBaseCommon
-from pof.indicator import ConditionIndicator
+from pof.indicator import (
+    ConditionIndicator,
+    PF_CURVE_KERNELS,
+    condition_profile,
+    pf_curve_condition,
+    profile_cache_info,
+)
 import pof.demo as demo
 
 
@@ -173,6 +180,207 @@ class TestConditionIndicator(TestPofBaseCommon, unittest.TestCase):
 
         NotImplemented
 
+    def test_profile_is_shared_and_read_only(self):
+
+        # Arrange
+        cond_1 = ConditionIndicator(
+            perfect=100, failed=0, pf_interval=7, pf_curve="linear"
+        )
+        cond_2 = ConditionIndicator(
+            perfect=100, failed=0, pf_interval=7, pf_curve="linear"
+        )
+        cond_3 = ConditionIndicator(
+            perfect=100, failed=50, pf_interval=7, pf_curve="linear"
+        )
+        condition_profile.cache_clear()
+
+        # Act
+        profile_1 = cond_1.get_profile()
+        profile_2 = cond_2.get_profile()
+        profile_3 = cond_3.get_profile()
+
+        # Assert
+        self.assertIs(profile_1, profile_2)
+        np.testing.assert_array_equal(profile_1, np.linspace(100, 0, 8))
+        np.testing.assert_array_equal(profile_3, np.linspace(100, 50, 8))
+        self.assertEqual(profile_cache_info().hits, 1)
+        self.assertEqual(profile_cache_info().misses, 2)
+        with self.assertRaises(ValueError):
+            profile_1[0] = 0
+
+    def test_sim_timeline_does_not_change_profile(self):
+
+        cond = ConditionIndicator(
+            perfect=100, failed=0, pf_interval=10, pf_curve="linear"
+        )
+
+        cond.sim_timeline(t_start=0, t_stop=10)
+        cond.sim_timeline(t_start=0, t_stop=5, t_delay=5)
+
+        np.testing.assert_array_equal(cond.get_profile(), np.linspace(100, 0, 11))
+
+    def test_profile_non_linear_curves(self):
+        for pf_curve in PF_CURVE_KERNELS:
+            for perfect, failed in [(100, 0), (0, 100)]:
+                with self.subTest(pf_curve=pf_curve, perfect=perfect):
+                    # Arrange
+                    cond = ConditionIndicator(
+                        perfect=perfect,
+                        failed=failed,
+                        pf_interval=20,
+                        pf_curve=pf_curve,
+                    )
+
+                    # Act
+                    profile = cond.get_profile()
+
+                    # Assert
+                    self.assertEqual(len(profile), 21)
+                    self.assertAlmostEqual(profile[0], perfect)
+                    self.assertAlmostEqual(profile[-1], failed)
+                    self.assertTrue(np.all(np.diff(profile) * (failed - perfect) > 0))
+
+    def test_profile_pf_curve_params(self):
+
+        cond = ConditionIndicator(
+            perfect=100,
+            failed=0,
+            pf_interval=10,
+            pf_curve="power",
+            pf_curve_params=dict(a=3),
+        )
+
+        np.testing.assert_allclose(
+            cond.get_profile(), 100 - 100 * (np.arange(11) / 10) ** 3
+        )
+
+    def test_pf_curve_condition_2d(self):
+
+        t = np.arange(24).reshape(4, 6)
+
+        condition = pf_curve_condition("exponential", 100, 0, t, pf_interval=20)
+
+        self.assertEqual(condition.shape, (4, 6))
+        np.testing.assert_allclose(
+            condition[1], pf_curve_condition("exponential", 100, 0, t[1], 20)
+        )
+        np.testing.assert_array_equal(condition.ravel()[20:], 0)
+
+    def test_changed_from(self):
+
+        # Arrange
+        cond = ConditionIndicator(
+            perfect=100, failed=0, pf_interval=10, pf_curve="linear"
+        )
+        cond.sim_timeline(t_start=0, t_stop=20, name="fm")
+        version = cond._version
+
+        # Act
+        cond.sim_timeline(t_delay=12, t_start=-3, t_stop=5, name="fm")
+        cond.sim_timeline(t_delay=8, t_start=-3, t_stop=9, name="fm")
+
+        # Assert
+        self.assertIsNone(cond.changed_from(cond._version))
+        self.assertEqual(cond.changed_from(version), 8)
+        self.assertEqual(cond.changed_from(cond._version - 1), 8)
+        self.assertEqual(cond.changed_from(-1), 0)
+        self.assertIs(cond.agg_timeline(), cond.agg_timeline())
+        with self.assertRaises(ValueError):
+            cond.agg_timeline()[0] = 0
+
+    def test_monotone_from(self):
+
+        # Arrange
+        cond = ConditionIndicator(
+            perfect=100, failed=0, pf_interval=10, pf_curve="linear"
+        )
+        curve = ConditionIndicator(
+            perfect=100, failed=0, pf_interval=10, pf_curve="exponential"
+        )
+
+        # Act
+        cond.sim_timeline(t_start=0, t_stop=20, name="fm_1")
+        cond.sim_timeline(t_start=-5, t_stop=15, name="fm_2")
+        cond.sim_timeline(t_delay=8, t_start=-3, t_stop=9, name="fm_1")
+        curve.sim_timeline(t_start=0, t_stop=20, name="fm_1")
+
+        # Assert
+        self.assertEqual(cond.monotone_from(), 8)
+        self.assertTrue((np.diff(cond.get_timeline()[8:]) <= 0).all())
+        self.assertIsNone(curve.monotone_from())
+
+    def test_agg_timeline_updates_changed_time_steps(self):
+
+        # Arrange
+        cond = ConditionIndicator(
+            perfect=100, failed=0, pf_interval=10, pf_curve="linear"
+        )
+        cond.sim_timeline(t_start=0, t_stop=20, name="fm_1")
+        cond.sim_timeline(t_start=-5, t_stop=15, name="fm_2")
+        agg = cond.agg_timeline()
+
+        # Act
+        cond.sim_timeline(t_delay=12, t_start=-3, t_stop=5, name="fm_1")
+        actual = cond.agg_timeline()
+
+        # Assert
+        self.assertIs(actual, agg)
+        np.testing.assert_array_equal(
+            actual, cond._aggregate(np.array(list(cond._timeline.values())))
+        )
+
+    def test_acc_timeline_writes_into_out(self):
+
+        # Arrange
+        cond = ConditionIndicator(
+            perfect=100, failed=0, pf_interval=10, pf_curve="linear"
+        )
+        cond._set_accumulated(accumulated=20)
+        expected = np.concatenate((np.full(5, 80), np.linspace(80, 0, 9), np.zeros(7)))
+        out = np.empty(21)
+
+        # Act
+        timeline = cond._acc_timeline(t_start=-5, t_stop=15, pf_interval=10, out=out)
+
+        # Assert
+        self.assertIs(timeline, out)
+        np.testing.assert_allclose(out, expected, atol=1e-12)
+
+    def test_expected_condition(self):
+
+        # Arrange
+        cond = ConditionIndicator(
+            perfect=100, failed=0, pf_interval=20, pf_curve="linear"
+        )
+        for i in range(10):
+            cond.sim_timeline(t_start=-i, t_stop=30 - i, name="fm")
+            cond.save_timeline(i)
+            cond.reset_for_next_sim()
+        timelines = cond.agg_timelines()
+        mean = timelines.mean(axis=0)
+        sigma = timelines.std(axis=0)
+
+        # Act
+        normal = cond.expected_condition(conf=0.8)
+        percentile = cond.expected_condition(conf=0.8, method="percentile")
+
+        # Assert
+        np.testing.assert_array_equal(normal["mean"], mean)
+        np.testing.assert_allclose(
+            normal["upper"],
+            np.minimum(np.nan_to_num(ss.norm.ppf(0.9, mean, sigma), nan=mean), 100),
+        )
+        np.testing.assert_allclose(
+            normal["lower"],
+            np.maximum(np.nan_to_num(ss.norm.ppf(0.1, mean, sigma), nan=mean), 0),
+        )
+        np.testing.assert_allclose(
+            percentile["lower"], np.percentile(timelines, 10, axis=0)
+        )
+        np.testing.assert_allclose(
+            percentile["upper"], np.percentile(timelines, 90, axis=0)
+        )
+
     # early start
 
     def test_sim_timeline_early_start_early_stop(self):
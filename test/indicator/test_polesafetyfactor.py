@@ -6,15 +6,15 @@
 """
 
 import unittest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 import copy
 
 import numpy as np
 
 import fixtures
 import testconfig  # pylint: disable=unused-import
-from test_load import TestPofBase
-from pof.indicator import PoleSafetyFactor
+from test_pof_base import TestPofBaseCommon  # pylint: disable=unused-import
+from pof.indicator import ConditionIndicator, PoleSafetyFactor
 import pof.demo as demo
 
 
@@ -33,11 +33,84 @@ class TestPoleSafetyFactor(unittest.TestCase):
         self._data_invalid_types = [
             {"invalid_type": "invalid_type", "indicator_type": "ConditionIndicator"}
         ]
-        self._data_complete = copy.deepcopy(fixtures.complete["pole_safey_factor"])
+        self._data_complete = copy.deepcopy(fixtures.complete["condition_indicator"])
+
+    def _component(self):
+        component = Mock()
+        component.indicator = dict(
+            external_diameter=ConditionIndicator(
+                name="external_diameter",
+                perfect=300,
+                failed=200,
+                pf_curve="linear",
+                pf_interval=30,
+            ),
+            wall_thickness=ConditionIndicator(
+                name="wall_thickness",
+                perfect=150,
+                failed=0,
+                pf_curve="linear",
+                pf_interval=20,
+            ),
+        )
+        component.info = dict(pole_load=np.array([[2], [4]]), pole_strength=8)
+        return component
 
     def test_sim_timeline(self):
         NotImplemented
 
+    def test_sim_timeline_only_recalculates_changes(self):
+
+        # Arrange
+        component = self._component()
+        ed = component.indicator["external_diameter"]
+        wt = component.indicator["wall_thickness"]
+        psf = PoleSafetyFactor(pf_curve="ssf_calc")
+        psf.link_component(component)
+        ed.sim_timeline(t_start=0, t_stop=50, name="fm")
+        wt.sim_timeline(t_start=0, t_stop=50, name="fm")
+        psf.sim_timeline()
+
+        # Act
+        wt.sim_timeline(t_delay=20, t_start=-10, t_stop=20, name="fm")
+        with patch.object(psf, "safety_factor", wraps=psf.safety_factor) as sf:
+            actual = psf.sim_timeline(t_delay=20)
+
+        # Assert
+        sf.assert_called_once_with("simple", t_from=20)
+        expected = psf._safety_factor(
+            agd=ed.perfect, czd=ed.get_timeline(), wt=wt.get_timeline()
+        )
+        np.testing.assert_array_equal(psf.get_timeline(), expected)
+        np.testing.assert_array_equal(actual, expected[20:])
+
+    def test_safety_factors_batch(self):
+
+        # Arrange
+        component = self._component()
+        ed = component.indicator["external_diameter"]
+        wt = component.indicator["wall_thickness"]
+        psf = PoleSafetyFactor(pf_curve="ssf_calc")
+        psf.link_component(component)
+        for i in range(3):
+            ed.sim_timeline(t_start=i, t_stop=i + 40, name="fm")
+            wt.sim_timeline(t_start=i, t_stop=i + 40, name="fm")
+            ed.save_timeline(i)
+            wt.save_timeline(i)
+            ed.reset_for_next_sim()
+            wt.reset_for_next_sim()
+
+        # Act
+        simple = psf.safety_factors("simple")
+        actual = psf.safety_factors(
+            "actual", czd=ed.agg_timelines()[0], wt=wt.agg_timelines()[0]
+        )
+
+        # Assert
+        self.assertEqual(simple.shape, (3, 41))
+        np.testing.assert_allclose(actual[0], simple[0])
+        np.testing.assert_allclose(actual[1], simple[0] / 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -44,13 +44,6 @@ class TestConditionTask(TestTaskCommon, unittest.TestCase):
             "failure": np.full(t, False),
         }
 
-        indicator = Mock()
-        indicator.get_timeline = Mock(return_value=condition)
-
-        indicators = {"condition_1": indicator, "condition_2": indicator}
-
-        param_list = [()]
-
         expected = np.array([-1] * 10 + [0] * 91)
 
         task = ConditionTask(
@@ -63,13 +56,66 @@ class TestConditionTask(TestTaskCommon, unittest.TestCase):
             }
         )
 
+        # Check the condition with and without the binary search for a monotone condition
+        for t_monotone in [None, 0]:
+            with self.subTest(t_monotone=t_monotone):
+                indicator = Mock()
+                indicator.get_timeline = Mock(return_value=condition)
+                indicator.monotone_from = Mock(return_value=t_monotone)
+
+                indicators = {"condition_1": indicator, "condition_2": indicator}
+
+                # Act
+                actual = task.sim_timeline(
+                    t_end=t_end, timeline=timeline, indicators=indicators
+                )
+
+                # Assert
+                np.testing.assert_array_equal(actual, expected)
+
+    def test_trigger_predicate_updated(self):
+
+        # Arrange
+        task = ConditionTask(
+            triggers={
+                "state": {"detection": True},
+                "condition": {"condition_1": {"lower": 0, "upper": 80}},
+            },
+        )
+        predicate = task.trigger_predicate
+
+        # Act
+        task.update_from_dict({"triggers": {"condition": {"condition_1": {"upper": 50}}}})
+
+        # Assert
+        self.assertIsNot(task.trigger_predicate, predicate)
+        self.assertEqual(task.trigger_predicate.conditions, (("condition_1", 0, 50),))
+
+    def test_sim_timeline_next_maintenance(self):
+
+        # Arrange
+        condition = np.array([100, 90, 80, 70, 60, 50, 40, 30, 20, 10])
+        timeline = {"detection": np.array([1, 1, 1, 1, 1, 1, 0, 0, 1, 1], dtype=bool)}
+
+        indicator = Mock()
+        indicator.get_timeline = Mock(return_value=condition)
+        indicator.monotone_from = Mock(return_value=0)
+
+        task = ConditionTask(
+            task_completion="next_maintenance",
+            triggers={
+                "state": {"detection": True},
+                "condition": {"condition_1": {"lower": 0, "upper": 80}},
+            },
+        )
+
         # Act
         actual = task.sim_timeline(
-            t_end=t_end, timeline=timeline, indicators=indicators
+            t_end=9, timeline=timeline, indicators={"condition_1": indicator}
         )
 
         # Assert
-        np.testing.assert_array_equal(actual, expected)
+        np.testing.assert_array_equal(actual, [-1, -1, 3, 2, 1, -1, -1, -1, 1, 1])
 
 
 if __name__ == "__main__":
@@ -10,6 +10,8 @@ import copy
 import unittest
 from unittest.mock import Mock
 
+import numpy as np
+
 import fixtures
 import testconfig  # pylint: disable=unused-import
 from task.test_task import TestTaskCommon
@@ -62,6 +64,35 @@ class TestInspection(TestTaskCommon, unittest.TestCase):
             # Assert
             self.assertEqual(expected, actual)
 
+    def test_is_effective(self):
+        """ Check an effective inspection detects when the state triggers and any of the condition triggers are met"""
+
+        # detection, initiation, fast_degrading, slow_degrading, expected
+        param_list = [
+            ([True], [False], [100], [100], True),  # Already detected
+            ([False], [False], [50], [50], False),  # Not initiated
+            ([False], [True], [80], [95], True),  # One condition within limits
+            ([False], [True], [95], [95], False),  # No conditions within limits
+        ]
+
+        for detection, initiation, fast, slow, expected in param_list:
+
+            # Arrange
+            inspection = Inspection.demo()
+            inspection.p_effective = 1
+            timeline = dict(
+                detection=np.array(detection),
+                initiation=np.array(initiation),
+                fast_degrading=np.array(fast),
+                slow_degrading=np.array(slow),
+            )
+
+            # Act
+            actual = inspection.is_effective(0, timeline)
+
+            # Assert
+            self.assertEqual(expected, actual)
+
     # **************** test_update ***********************
 
 
@@ -15,7 +15,7 @@ import fixtures
 import testconfig  # pylint: disable=unused-import
 
 from .test_task import TestTaskCommon
-from pof.task import ScheduledTask
+from pof.task import ScheduledTask, schedule_countdown
 
 
 class TestScheduledTask(TestTaskCommon, unittest.TestCase):
@@ -74,6 +74,41 @@ class TestScheduledTask(TestTaskCommon, unittest.TestCase):
                     # Assert
                     np.testing.assert_array_equal(expected, schedule)
 
+    def test_sim_timeline_cached(self):
+        """Check the schedule is shared between tasks with the same parameters and can't be modified"""
+        # Arrange
+        task_1 = ScheduledTask(t_delay=5, t_interval=3)
+        task_2 = ScheduledTask(t_delay=5, t_interval=3)
+        schedule_countdown.cache_clear()
+
+        # Act
+        schedule_1 = task_1.sim_timeline(t_start=0, t_end=100)
+        schedule_2 = task_2.sim_timeline(t_start=10, t_end=100)
+
+        # Assert
+        self.assertEqual(schedule_countdown.cache_info().hits, 1)
+        np.testing.assert_array_equal(schedule_1[10:], schedule_2)
+        with self.assertRaises(ValueError):
+            schedule_2[0] = 10
+
+    def test_next_due(self):
+        """Check the next due time matches the first zero in the schedule"""
+        for t_interval in [1, 3, 5]:
+            for t_delay in [0, 1, 5, 200]:
+                # Arrange
+                task = ScheduledTask(t_delay=t_delay, t_interval=t_interval)
+                schedule = task.sim_timeline(t_start=0, t_end=100)
+
+                for t in range(101):
+                    due = schedule[t:] == 0
+                    expected = t + np.argmax(due) if due.any() else None
+
+                    # Act
+                    t_due = task.next_due(t, t_end=100)
+
+                    # Assert
+                    self.assertEqual(t_due, expected)
+
 
 if __name__ == "__main__":
     unittest.main()
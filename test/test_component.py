@@ -9,13 +9,16 @@ import unittest
 from unittest.mock import Mock, patch
 import os
 
+import pandas as pd
+
+
 from test_pof_base import TestPofBaseCommon
 from pof.paths import Paths
 import testconfig  # pylint: disable=unused-import
 from pof.component import Component, calc_confidence_interval, sort_df
 from config import config
 from pof.interface.figures import calc_y_max
-from pof.data.asset_data import SimpleFleet
+from pof.loader.asset_data import SimpleFleet
 import fixtures
 from pof.units import scale_units
 from pof.component import Component
@@ -202,6 +205,43 @@ class TestComponent(TestPofBaseCommon, unittest.TestCase):
 
         comp.mc_timeline(t_end=100)
 
+    def test_mc_timeline_after_cancel_sim(self):
+        for n_workers in [None, 2]:
+            with self.subTest(n_workers=n_workers):
+                # Arrange
+                comp = Component.demo()
+                n_iterations = 40
+                comp.cancel_sim()
+
+                # Act
+                comp.mc_timeline(
+                    t_end=50, n_iterations=n_iterations, n_workers=n_workers, seed=1
+                )
+
+                # Assert
+                self.assertTrue(comp.up_to_date)
+                self.assertEqual(comp._sim_counter, n_iterations)
+
+    def test_mc_timeline_seed_is_reproducible(self):
+        # Arrange
+        comp_1 = Component.demo()
+        comp_2 = Component.demo()
+
+        # Act
+        comp_1.mc_timeline(t_end=100, n_iterations=10, seed=1)
+        comp_2.mc_timeline(t_end=100, n_iterations=10, seed=1)
+
+        # Assert
+        for fm_name, fm in comp_1.fm.items():
+            self.assertEqual(fm._t_func_failure, comp_2.fm[fm_name]._t_func_failure)
+            for task_name, task in fm.tasks.items():
+                self.assertEqual(
+                    task.t_completion, comp_2.fm[fm_name].tasks[task_name].t_completion
+                )
+        pd.testing.assert_frame_equal(
+            comp_1.expected_risk_cost_df(), comp_2.expected_risk_cost_df()
+        )
+
     def test_mc_timeline_remain_failed(self):
         """ Check that only one failure mode is triggered when remain failed is true"""
         # Arrange
@@ -249,10 +289,70 @@ class TestComponent(TestPofBaseCommon, unittest.TestCase):
 
         # Act
         comp.mc_timeline(t_end=t_end, n_iterations=n_iterations)
+        erc = comp.expected_risk_cost()
         actual = comp.expected_risk_cost_df()
 
         # Assert
-        # TODO make asserts
+        for fm_name, tasks in erc.items():
+            for task_name, expected in tasks.items():
+                df = actual[
+                    (actual["failure_mode"] == fm_name) & (actual["task"] == task_name)
+                ].sort_values("time")
+
+                self.assertAlmostEqual(df["cost"].sum(), expected["cost"].sum())
+                self.assertAlmostEqual(df["cost_cumulative"].iloc[-1], expected["cost"].sum())
+                self.assertAlmostEqual(
+                    df["quantity_lifecycle"].iloc[-1],
+                    expected["quantity"].sum() / comp.expected_life(),
+                )
+
+    def test_expected_untreated_is_kept_until_dists_change(self):
+
+        # Arrange
+        comp = Component.demo()
+        fm = list(comp.fm.values())[0]
+
+        # Act
+        expected = comp.expected_untreated(t_end=50)
+        kept = comp.expected_untreated(t_end=50)
+        fm.untreated.alpha = fm.untreated.alpha * 2
+        actual = comp.expected_untreated(t_end=50)
+
+        # Assert
+        self.assertIs(kept, expected)
+        self.assertIsNot(actual, expected)
+        self.assertTrue((actual[fm.name]["pof"] < expected[fm.name]["pof"])[1:].any())
+
+    def test_calc_pof_df(self):
+
+        # Arrange
+        t_end = 50
+        comp = Component.demo()
+        fm_inactive = list(comp.fm)[0]
+        comp.fm[fm_inactive].active = False
+        comp.mc_timeline(t_end=t_end, n_iterations=2)
+
+        # Act
+        actual = comp.calc_pof_df(t_end=t_end)
+
+        # Assert
+        self.assertEqual(
+            list(actual.columns), ["strategy", "source", "pof", "active", "time"]
+        )
+        for strategy, pof in dict(
+            maint=comp.expected_pof(t_end=t_end),
+            no_maint=comp.expected_untreated(t_end=t_end),
+        ).items():
+            for source, expected in pof.items():
+                df = actual[(actual["strategy"] == strategy) & (actual["source"] == source)]
+                self.assertEqual(list(df["pof"]), list(expected["pof"]))
+                self.assertEqual(list(df["time"]), list(expected["time"]))
+                self.assertTrue((df["active"] == expected["active"]).all())
+
+        # The inactive failure mode is a single empty row for the maintained strategy
+        df = actual[(actual["strategy"] == "maint") & (actual["source"] == fm_inactive)]
+        self.assertEqual(len(df), 1)
+        self.assertTrue(df[["pof", "active", "time"]].isna().all(axis=None))
 
     def test_expected_condition_with_timelines(self):
         # TODO make it work when mc_timeline hs nto been called
@@ -8,7 +8,9 @@
 
 import copy
 import unittest
+from unittest.mock import patch
 
+import numpy as np
 import scipy.stats as ss
 
 import fixtures
@@ -90,6 +92,73 @@ class TestDistribution(TestPofBaseCommon, unittest.TestCase):
 
         # Check the boundary cases
 
+    def test_sample_matches_weibull(self):
+
+        dist = Distribution(alpha=50, beta=1.5, gamma=10)
+        dist.set_rng(1)
+
+        samples = dist.sample(size=5000)
+        __, p_value = ss.kstest(
+            samples, "weibull_min", args=(dist.beta, dist.gamma, dist.alpha)
+        )
+
+        self.assertEqual(samples.shape, (5000,))
+        self.assertGreater(samples.min(), dist.gamma)
+        self.assertGreater(p_value, 0.01)
+
+    def test_sample_refills_pool(self):
+
+        with patch.dict("pof.pof_base.cf", {"random_pool_size": 4}):
+            dist_1 = Distribution(alpha=50, beta=1.5, gamma=10)
+            dist_2 = Distribution(alpha=50, beta=1.5, gamma=10)
+            dist_1.set_rng(1)
+            dist_2.set_rng(1)
+
+            # Draw more samples than the pool holds one at a time and in blocks
+            single = [dist_1.sample()[0] for __ in range(10)]
+            block = dist_2.sample(size=10)
+
+        np.testing.assert_array_almost_equal(single, block)
+        self.assertEqual(len(set(single)), 10)
+
+    def test_curves_match_scipy(self):
+
+        x = np.arange(0, 201)
+        t = np.linspace(0, 200, 201)
+        args = (self.beta,)
+        kwargs = dict(scale=self.alpha, loc=self.gamma)
+
+        np.testing.assert_array_equal(
+            self.dist.sf(0, 200), ss.weibull_min.sf(t, *args, **kwargs)
+        )
+        np.testing.assert_array_equal(
+            self.dist.cdf(0, 200), ss.weibull_min.cdf(t, *args, **kwargs)
+        )
+        np.testing.assert_array_equal(
+            self.dist.csf(50, 200),
+            ss.weibull_min.sf(x[50:], *args, **kwargs)
+            / ss.weibull_min.sf(50, *args, **kwargs),
+        )
+        self.assertEqual(
+            self.dist.conditional_f(20, 60),
+            1
+            - ss.weibull_min.sf(60, *args, **kwargs)
+            / ss.weibull_min.sf(20, *args, **kwargs),
+        )
+
+    def test_curves_are_cached_until_parameters_change(self):
+
+        sf = self.dist.sf(0, 100)
+
+        self.assertIs(sf, self.dist.sf(0, 100))
+        with self.assertRaises(ValueError):
+            sf[0] = 0
+
+        self.dist.alpha = 60
+
+        self.assertIsNot(sf, self.dist.sf(0, 100))
+        self.assertGreater(self.dist.sf(0, 100)[50], sf[50])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -12,8 +12,9 @@ import numpy as np
 import fixtures
 import testconfig  # pylint: disable=unused-import
 from test_pof_base import TestPofBaseCommon
-from pof.failure_mode import FailureMode
+from pof.failure_mode import FailureMode, fit_weibull_censored
 from pof.task import Task
+from pof.timeline_store import EventHistogram
 import pof.demo as demo
 
 
@@ -123,6 +124,53 @@ class TestFailureMode(TestPofBaseCommon, unittest.TestCase):
 
     #     fm.update_timeline(t_start=5, updates=dict(initiation=False))
 
+    def test_update_timeline_only_recomputes_changed_tasks(self):
+        """ Check condition tasks are only recomputed when one of their triggers has changed"""
+
+        # Arrange
+        fm = FailureMode.demo()
+        fm.set_rng(1)
+        fm.init_timeline(200)
+        expected = {name: fm.timeline[name].copy() for name in fm.tasks}
+
+        for task in fm.tasks.values():
+            task.sim_timeline = Mock(wraps=task.sim_timeline)
+
+        # Act
+        fm.update_timeline(t_start=10, updates=dict(detection=True))
+
+        # Assert
+        fm.tasks["on_condition_repair"].sim_timeline.assert_called_once()
+        fm.tasks["on_condition_replacement"].sim_timeline.assert_called_once()
+        fm.tasks["on_failure_replacement"].sim_timeline.assert_not_called()
+        np.testing.assert_array_equal(
+            fm.timeline["on_failure_replacement"], expected["on_failure_replacement"]
+        )
+
+    def test_plan_is_cached_until_model_changes(self):
+
+        # Arrange
+        fm = FailureMode.demo()
+
+        # Act
+        plan = fm.plan
+
+        # Assert
+        self.assertIs(fm.plan, plan)
+        self.assertEqual(set(plan["conditions"]), {"slow_degrading", "fast_degrading"})
+        self.assertEqual(plan["time_tasks"], ["inspection"])
+        self.assertEqual(
+            plan["condition_tasks"],
+            ["on_condition_repair", "on_condition_replacement", "on_failure_replacement"],
+        )
+
+        fm.update_from_dict({"tasks": {"inspection": {"t_interval": 10}}})
+        self.assertIsNot(fm.plan, plan)
+
+        plan = fm.plan
+        fm.set_tasks(None)
+        self.assertEqual(fm.plan["time_tasks"], [])
+
     # -------------Test sim_timleine ----------------------
 
     # TODO figure out what this test was meant to target
@@ -289,6 +337,33 @@ class TestFailureMode(TestPofBaseCommon, unittest.TestCase):
                         "task should not be triggered again",
                     )
 
+    def test_sim_timeline_task_queue_matches_scan(self):
+        """ Check the task queue completes the same tasks as scanning the task timelines"""
+
+        fms = dict()
+        for task_queue in [True, False]:
+            # Arrange
+            fm = FailureMode.demo()
+            fm.set_rng(1)
+
+            # Act
+            with patch.dict("pof.failure_mode.cf", {"task_queue": task_queue}):
+                for i in range(10):
+                    fm.sim_timeline(200)
+                    fm.save_timeline(i)
+                    fm.reset_for_next_sim()
+
+            fms[task_queue] = fm
+
+        # Assert
+        for task_name, task in fms[True].tasks.items():
+            self.assertEqual(
+                task.t_completion, fms[False].tasks[task_name].t_completion
+            )
+        for i in range(10):
+            for key, value in fms[True]._timelines[i].items():
+                np.testing.assert_array_equal(value, fms[False]._timelines[i][key])
+
     # ************ Test sim_timeline ***********************
 
     def test_sim_timeline_condition_step(self):  # TODO full coverage
@@ -366,6 +441,179 @@ class TestFailureMode(TestPofBaseCommon, unittest.TestCase):
 
         fm.mc_timeline(200)
 
+    def test_mc_timeline_batch_matches_single_timelines(self):
+        """ Check the batch simulation records the same failures, tasks and timelines as the single timelines"""
+
+        data = copy.deepcopy(demo.failure_mode_data["random"])
+        data["tasks"]["inspection"]["p_effective"] = 1
+
+        for t_initiate in [0, 17, 120, 199, 250]:
+            results = []
+            for batch in [False, True]:
+                # Arrange
+                fm = FailureMode.load(copy.deepcopy(data))
+                fm.dists["init"].sample = Mock(
+                    side_effect=lambda size=1, t=t_initiate: np.full(size, float(t))
+                )
+
+                # Act
+                fm.mc_timeline(t_end=200, n_iterations=3, batch=batch)
+                results.append(fm)
+
+            # Assert
+            single, batch = results
+            self.assertEqual(single._sim_counter, batch._sim_counter)
+            self.assertEqual(single._t_func_failure, batch._t_func_failure)
+            self.assertEqual(single._t_cond_failure, batch._t_cond_failure)
+            for task_name, task in single.tasks.items():
+                self.assertEqual(
+                    sorted(task.t_completion),
+                    sorted(batch.tasks[task_name].t_completion),
+                )
+            for key, timeline in single._timelines[2].items():
+                np.testing.assert_array_equal(timeline, batch._timelines[2][key])
+
+    def test_mc_timeline_batch_matches_seeded_single_timelines(self):
+        """ Check a seeded batch simulation gives the same timelines as the seeded single timelines"""
+        for name in ["random", "early_life"]:
+            with self.subTest(name=name):
+                results = []
+                for batch in [False, True]:
+                    # Arrange
+                    fm = FailureMode.load(copy.deepcopy(demo.failure_mode_data[name]))
+
+                    # Act
+                    fm.mc_timeline(t_end=200, n_iterations=500, batch=batch, seed=11)
+                    results.append(fm)
+
+                # Assert
+                single, batch = results
+                self.assertEqual(single._t_func_failure, batch._t_func_failure)
+                self.assertEqual(single._t_cond_failure, batch._t_cond_failure)
+                for i, timelines in single._timelines.items():
+                    for key, timeline in timelines.items():
+                        np.testing.assert_array_equal(timeline, batch._timelines[i][key])
+
+    def test_mc_timeline_batch_not_supported(self):
+
+        # Arrange
+        fm = FailureMode.demo()  # on condition repair changes the condition mid timeline
+        fm._mc_timeline_batch = Mock()
+
+        # Act
+        fm.mc_timeline(t_end=20, n_iterations=10, batch=True)
+
+        # Assert
+        fm._mc_timeline_batch.assert_not_called()
+        self.assertEqual(fm._sim_counter, 10)
+
+    def test_mc_timeline_seed_is_reproducible(self):
+        """ Check the same seed gives the same results and a different seed gives different results"""
+        for batch in [False, True]:
+            # Arrange
+            fm_1 = FailureMode.demo()
+            fm_2 = FailureMode.demo()
+            fm_3 = FailureMode.demo()
+
+            # Act
+            fm_1.mc_timeline(t_end=200, n_iterations=20, batch=batch, seed=1)
+            fm_2.mc_timeline(t_end=200, n_iterations=20, batch=batch, seed=1)
+            fm_3.mc_timeline(t_end=200, n_iterations=20, batch=batch, seed=2)
+
+            # Assert
+            self.assertEqual(fm_1._t_func_failure, fm_2._t_func_failure)
+            self.assertNotEqual(fm_1._t_func_failure, fm_3._t_func_failure)
+            for i in range(20):
+                for key, value in fm_1._timelines[i].items():
+                    np.testing.assert_array_equal(value, fm_2._timelines[i][key])
+
+    def test_mc_timeline_keep_timelines_false(self):
+        """ Check the summary mode gives the same expected values as the stored timelines"""
+        for batch in [False, True]:
+            # Arrange
+            fm_1 = FailureMode.demo()
+            fm_2 = FailureMode.demo()
+
+            # Act
+            fm_1.mc_timeline(t_end=200, n_iterations=50, batch=batch, seed=1)
+            fm_2.mc_timeline(
+                t_end=200, n_iterations=50, batch=batch, seed=1, keep_timelines=False
+            )
+
+            # Assert
+            self.assertEqual(len(fm_2._timelines), 50)
+            with self.assertRaises(ValueError):
+                fm_2._timelines.stack("failure")
+            first, censored = fm_2._timelines.first_events("failure")
+            self.assertEqual(
+                first.sum(), sum(tl["failure"].any() for tl in fm_1._timelines.values())
+            )
+            self.assertEqual(first.sum() + censored.sum(), 50)
+            pof_1 = fm_1.expected_pof()
+            pof_2 = fm_2.expected_pof()
+            self.assertAlmostEqual(pof_1.alpha, pof_2.alpha)
+            self.assertAlmostEqual(pof_1.beta, pof_2.beta)
+            self.assertIsInstance(fm_2._t_func_failure, EventHistogram)
+            self.assertEqual(len(fm_2._t_func_failure), len(fm_1._t_func_failure))
+            erc_1 = fm_1.expected_risk_cost()
+            erc_2 = fm_2.expected_risk_cost()
+            for name, expected in erc_1.items():
+                for key in ["time", "quantity", "cost"]:
+                    np.testing.assert_array_equal(expected[key], erc_2[name][key])
+
+    def test_mc_timeline_keep_timelines_false_inactive(self):
+        # Arrange
+        fm = FailureMode.demo()
+        fm.active = False
+
+        # Act
+        fm.mc_timeline(t_end=50, n_iterations=3, seed=1, keep_timelines=False)
+
+        # Assert
+        self.assertEqual(len(fm._timelines), 3)
+        self.assertEqual(len(fm._t_func_failure), 0)
+
+    def test_expected_pof_is_kept_until_timelines_change(self):
+
+        # Arrange
+        fm = FailureMode.demo()
+        fm.mc_timeline(t_end=200, n_iterations=50, seed=1)
+
+        # Act
+        pof_1 = fm.expected_pof()
+        pof_2 = fm.expected_pof()
+        fm.mc_timeline(t_end=200, n_iterations=50, seed=2)
+        pof_3 = fm.expected_pof()
+
+        # Assert
+        self.assertIs(pof_1, pof_2)
+        self.assertIsNot(pof_1, pof_3)
+
+    def test_fit_weibull_censored(self):
+        """ Check the fit matches the lifelines WeibullFitter"""
+        from lifelines import WeibullFitter
+
+        rng = np.random.default_rng(1)
+
+        for alpha, beta in [(100, 1), (10, 3), (50, 0.5)]:
+            # Arrange
+            durations = alpha * rng.weibull(beta, size=500)
+            event_observed = durations < alpha
+            durations = np.minimum(durations, alpha)
+
+            # Act
+            fitted_alpha, fitted_beta = fit_weibull_censored(durations, event_observed)
+            wbf = WeibullFitter().fit(durations, event_observed)
+
+            # Assert
+            self.assertAlmostEqual(fitted_alpha / wbf.lambda_, 1, places=4)
+            self.assertAlmostEqual(fitted_beta / wbf.rho_, 1, places=4)
+
+        self.assertIsNone(fit_weibull_censored([0, 5, 10], [True, True, False]))
+        self.assertIsNone(fit_weibull_censored([5.0], [True]))
+        self.assertIsNone(fit_weibull_censored([5, 5, 5], [True, True, False]))
+        self.assertIsNotNone(fit_weibull_censored([4, 5, 5], [True, True, False]))
+
     # ************ Test get_dash_ids *****************
 
     def test_get_dash_id(self):
@@ -501,18 +749,23 @@ class TestFailureMode(TestPofBaseCommon, unittest.TestCase):
 
         for alpha, beta, gamma in param_untreated:
             # Arrange
-            fm = FailureMode(untreated={"alpha": alpha, "beta": beta, "gamma": gamma})
-            fm.mc_timeline(t_end=t_end, n_iterations=n_iterations)
+            for batch in [False, True]:
+                fm = FailureMode(
+                    untreated={"alpha": alpha, "beta": beta, "gamma": gamma}
+                )
+                fm.mc_timeline(
+                    t_end=t_end, n_iterations=n_iterations, batch=batch, seed=1
+                )
 
-            # Act
-            treated = fm.expected_pof()
+                # Act
+                treated = fm.expected_pof()
 
-            # Assert
-            for param in ["alpha", "beta", "gamma"]:
-                actual = getattr(treated, param)
-                expected = getattr(fm.dists["init"], param)
-                delta = expected / 10
-                self.assertAlmostEqual(actual, expected, delta=delta)
+                # Assert
+                for param in ["alpha", "beta", "gamma"]:
+                    actual = getattr(treated, param)
+                    expected = getattr(fm.dists["init"], param)
+                    delta = expected / 10
+                    self.assertAlmostEqual(actual, expected, delta=delta)
 
     # ------------ Integration Tests ---------------
 
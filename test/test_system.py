@@ -3,6 +3,9 @@ import unittest
 from unittest.mock import Mock, patch
 import os
 
+import numpy as np
+import pandas as pd
+
 from test_pof_base import TestPofBaseCommon
 from pof.paths import Paths
 from config import config
@@ -233,6 +236,146 @@ class TestSystem(TestPofBaseCommon, unittest.TestCase):
 
         system.mc_timeline(t_end=100)
 
+    def test_mc_timeline_n_workers(self):
+        # Arrange
+        system = System.demo()
+        n_iterations = 6
+
+        # Act
+        system.mc_timeline(t_end=50, n_iterations=n_iterations, n_workers=2)
+
+        # Assert
+        comp = system.comp["pole"]
+        self.assertEqual(system._sim_counter, n_iterations)
+        self.assertEqual(comp._sim_counter, n_iterations)
+        for fm in comp.fm.values():
+            self.assertEqual(fm._sim_counter, n_iterations)
+            self.assertEqual(list(fm._timelines), list(range(n_iterations)))
+        for ind in comp.indicator.values():
+            self.assertEqual(len(ind._timelines), n_iterations)
+
+        system.expected_risk_cost_df()
+
+    def test_mc_timeline_after_cancel_sim(self):
+        for n_workers in [None, 2]:
+            with self.subTest(n_workers=n_workers):
+                # Arrange
+                system = System.demo()
+                n_iterations = 40
+                system.cancel_sim()
+
+                # Act
+                system.mc_timeline(
+                    t_end=50, n_iterations=n_iterations, n_workers=n_workers, seed=1
+                )
+
+                # Assert
+                self.assertTrue(system.up_to_date)
+                self.assertEqual(system._sim_counter, n_iterations)
+                self.assertEqual(system.comp["pole"]._sim_counter, n_iterations)
+
+    def test_mc_timeline_seed_is_reproducible(self):
+        for n_workers in [None, 2]:
+            # Arrange
+            system_1 = System.demo()
+            system_2 = System.demo()
+
+            # Act
+            system_1.mc_timeline(t_end=50, n_iterations=6, n_workers=n_workers, seed=1)
+            system_2.mc_timeline(t_end=50, n_iterations=6, n_workers=n_workers, seed=1)
+
+            # Assert
+            pd.testing.assert_frame_equal(
+                system_1.expected_risk_cost_df(), system_2.expected_risk_cost_df()
+            )
+            for fm_name, fm in system_1.comp["pole"].fm.items():
+                fm_2 = system_2.comp["pole"].fm[fm_name]
+                self.assertEqual(fm._t_func_failure, fm_2._t_func_failure)
+                self.assertEqual(fm._t_cond_failure, fm_2._t_cond_failure)
+                for i, timeline in fm._timelines.items():
+                    for key, values in timeline.items():
+                        np.testing.assert_array_equal(values, fm_2._timelines[i][key])
+
+    def test_mc_timeline_keep_timelines_false(self):
+        for n_workers in [None, 2]:
+            # Arrange
+            system_1 = System.demo()
+            system_2 = System.demo()
+
+            # Act
+            system_1.mc_timeline(t_end=100, n_iterations=8, n_workers=n_workers, seed=1)
+            system_2.mc_timeline(
+                t_end=100,
+                n_iterations=8,
+                n_workers=n_workers,
+                seed=1,
+                keep_timelines=False,
+            )
+
+            # Assert
+            pd.testing.assert_frame_equal(
+                system_1.expected_risk_cost_df(), system_2.expected_risk_cost_df()
+            )
+            self.assertEqual(
+                system_1.comp["pole"].expected_life(),
+                system_2.comp["pole"].expected_life(),
+            )
+
+    def test_mp_timeline_tolerance(self):
+        # Arrange
+        system = System.demo()
+        max_iterations = 30
+
+        # Act
+        system.mp_timeline(
+            t_end=50,
+            n_iterations=10,
+            tolerance=0,
+            seed=1,
+            max_iterations=max_iterations,
+        )
+
+        # Assert
+        self.assertEqual(system._sim_counter, max_iterations)
+        self.assertEqual(system.n, max_iterations)
+        self.assertEqual(system.progress(), 1)
+        self.assertGreater(system.sim_error, 0)
+
+        # Act
+        system.mp_timeline(
+            t_end=50,
+            n_iterations=10,
+            tolerance=1,
+            seed=1,
+            max_iterations=max_iterations,
+        )
+
+        # Assert
+        self.assertEqual(system._sim_counter, 10)
+        self.assertLessEqual(system.sim_error, 1)
+
+    def test_mp_timeline_tolerance_parallel(self):
+        # Arrange
+        system = System.demo()
+        max_iterations = 30
+
+        # Act
+        system.mp_timeline(
+            t_end=50,
+            n_iterations=10,
+            n_workers=2,
+            tolerance=0,
+            seed=1,
+            max_iterations=max_iterations,
+        )
+        template = system._sim_template()
+
+        # Assert
+        self.assertEqual(system._sim_counter, max_iterations)
+        self.assertEqual(system.n, max_iterations)
+        self.assertEqual(template._sim_counter, 0)
+        self.assertEqual(template.comp["pole"]._sim_counter, 0)
+
     def cancel_sim(self):
         system = System.demo()
 
@@ -317,7 +460,35 @@ class TestSystem(TestPofBaseCommon, unittest.TestCase):
         actual = system.expected_risk_cost_df()
 
         # Assert
-        # TODO make asserts
+        self.assertEqual(actual["comp"].dtype, "category")
+        self.assertEqual(list(actual["comp"].unique()), ["pole"])
+        pd.testing.assert_frame_equal(
+            actual.drop(columns="comp").astype({"failure_mode": object}),
+            system.comp["pole"].df_erc.drop(columns="comp"),
+        )
+
+    def test_comp_reports_are_concatenated_in_order(self):
+
+        # Arrange
+        system = System.demo()
+        comp = copy.deepcopy(system.comp["pole"])
+        comp.name = "pole_2"
+        system.comp["pole_2"] = comp
+        system.mc_timeline(t_end=20, n_iterations=2)
+
+        for n_threads in [1, 2]:
+            with self.subTest(n_threads=n_threads):
+                with patch.dict(cf, report_threads=n_threads):
+
+                    # Act
+                    actual = system.expected_risk_cost_df()
+
+                # Assert
+                self.assertEqual(list(actual["comp"].cat.categories), ["pole", "pole_2"])
+                self.assertEqual(list(actual["comp"].unique()), ["pole", "pole_2"])
+                self.assertEqual(
+                    len(actual), len(system.comp["pole"].df_erc) + len(comp.df_erc)
+                )
 
     # calc_pof_df
     # calc_df_task_forecast
@@ -0,0 +1,221 @@
+"""
+    Filename: test_timeline_store.py
+    Description: Contains the code for testing the TimelineStore class
+"""
+
+import unittest
+
+import numpy as np
+
+import testconfig  # pylint: disable=unused-import
+from pof.timeline_store import (
+    EventHistogram,
+    P2Quantile,
+    TimelineStore,
+    TimelineSummary,
+    compact_dtype,
+)
+
+
+class TestTimelineStore(unittest.TestCase):
+    def test_compact_dtype(self):
+        self.assertEqual(compact_dtype(np.array([True, False])), np.dtype(bool))
+        self.assertEqual(compact_dtype(np.array([-1, 100])), np.dtype(np.int16))
+        self.assertEqual(compact_dtype(np.array([-1, 100000])), np.dtype(np.int32))
+        self.assertEqual(compact_dtype(np.array([0.5, 1.5])), np.dtype(np.float32))
+
+    def test_save_and_get(self):
+
+        # Arrange
+        store = TimelineStore()
+        timelines = {
+            i: dict(
+                time=np.arange(10),
+                failure=np.arange(10) > i,
+                task=np.arange(10) - i,
+            )
+            for i in range(20)
+        }
+
+        # Act
+        for i, timeline in timelines.items():
+            store.save(i, timeline)
+
+        # Assert
+        self.assertEqual(len(store), 20)
+        self.assertEqual(list(store), list(range(20)))
+        self.assertEqual(store.stack("task").dtype, np.int16)
+        for i, timeline in store.items():
+            for key, values in timeline.items():
+                np.testing.assert_array_equal(values, timelines[i][key])
+        np.testing.assert_array_equal(
+            store.mean("task"), np.mean([tl["task"] for tl in timelines.values()], axis=0)
+        )
+
+    def test_save_different_lengths(self):
+
+        # Arrange
+        store = TimelineStore()
+
+        # Act
+        store.save(0, dict(time=np.arange(5), task=np.arange(5)))
+        store.save(1, dict(time=np.arange(10), task=np.arange(10) * 10000))
+
+        # Assert
+        np.testing.assert_array_equal(store[0]["task"], np.arange(5))
+        np.testing.assert_array_equal(store[1]["task"], np.arange(10) * 10000)
+        np.testing.assert_array_equal(store.lengths("task"), [5, 10])
+        self.assertEqual(store.stack("task", padded=True).shape, (2, 10))
+        with self.assertRaises(ValueError):
+            store.stack("task")
+
+    def test_save_many_and_merge(self):
+
+        # Arrange
+        store = TimelineStore()
+        other = TimelineStore()
+        values = np.tile(np.arange(6), (3, 1))
+
+        # Act
+        store.save_many(0, dict(task=values), lengths=[6, 3, 1])
+        other.save_many(0, dict(task=values))
+        store.merge(other, offset=3)
+
+        # Assert
+        self.assertEqual(list(store), list(range(6)))
+        np.testing.assert_array_equal(store[1]["task"], np.arange(3))
+        np.testing.assert_array_equal(store[5]["task"], np.arange(6))
+        np.testing.assert_array_equal(store.lengths("task"), [6, 3, 1, 6, 6, 6])
+
+    def test_first_event_times(self):
+
+        # Arrange
+        store = TimelineStore()
+        store.save(0, dict(time=np.arange(5), failure=np.arange(5) >= 3))
+        store.save(1, dict(time=np.arange(10, 16), failure=np.full(6, False)))
+        store.save(2, dict(time=np.arange(3), failure=np.full(3, True)))
+
+        # Act
+        t_event, observed = store.first_event_times("failure")
+
+        # Assert
+        np.testing.assert_array_equal(t_event, [3, 15, 0])
+        np.testing.assert_array_equal(observed, [True, False, True])
+
+    def test_rows_are_read_only(self):
+
+        store = TimelineStore()
+        store.save(0, dict(task=np.arange(5)))
+
+        with self.assertRaises(ValueError):
+            store[0]["task"][0] = 10
+
+
+
+class TestTimelineSummary(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.values = rng.normal(10, 2, size=(2000, 5))
+        self.failure = np.arange(5) >= rng.integers(0, 7, size=(2000, 1))
+
+    def test_moments_are_exact(self):
+
+        # Arrange
+        summary = TimelineSummary()
+
+        # Act
+        for i in range(len(self.values)):
+            summary.save(i, dict(condition=self.values[i], failure=self.failure[i]))
+
+        # Assert
+        self.assertEqual(len(summary), 2000)
+        np.testing.assert_allclose(summary.mean("condition"), self.values.mean(axis=0))
+        np.testing.assert_allclose(summary.std("condition"), self.values.std(axis=0))
+        np.testing.assert_allclose(summary.mean("failure"), self.failure.mean(axis=0))
+        with self.assertRaises(ValueError):
+            summary.stack("condition")
+        with self.assertRaises(ValueError):
+            summary.percentile("condition", 50)
+
+    def test_percentile_is_close(self):
+
+        summary = TimelineSummary()
+        summary.save_many(0, dict(condition=self.values))
+
+        for q in [10, 90]:
+            np.testing.assert_allclose(
+                summary.percentile("condition", q),
+                np.percentile(self.values, q, axis=0),
+                rtol=0.02,
+            )
+
+    def test_percentile_is_exact_within_a_block(self):
+
+        summary = TimelineSummary(block_size=256)
+        summary.save_many(0, dict(condition=self.values[:200]))
+        summary.save(200, dict(condition=self.values[200, :3]))
+
+        expected = np.percentile(self.values[:200], 10, axis=0)
+        expected[:3] = np.percentile(self.values[:201, :3], 10, axis=0)
+        np.testing.assert_allclose(summary.percentile("condition", 10), expected)
+
+    def test_merge(self):
+
+        # Arrange
+        summary = TimelineSummary()
+        other = TimelineSummary()
+
+        # Act
+        summary.save_many(0, dict(condition=self.values[:500], failure=self.failure[:500]))
+        other.save_many(0, dict(condition=self.values[500:], failure=self.failure[500:]))
+        summary.merge(other, offset=500)
+
+        # Assert
+        self.assertEqual(len(summary), 2000)
+        np.testing.assert_allclose(summary.mean("condition"), self.values.mean(axis=0))
+        np.testing.assert_allclose(summary.std("condition"), self.values.std(axis=0))
+        first, censored = summary.first_events("failure")
+        self.assertEqual(first.sum() + censored.sum(), 2000)
+        np.testing.assert_array_equal(
+            first, np.bincount(self.failure.argmax(axis=1)[self.failure.any(axis=1)], minlength=5)
+        )
+
+    def test_p2_quantile_small_sample_is_exact(self):
+
+        estimator = P2Quantile(0.5)
+        for x in self.values[:3]:
+            estimator.update(x)
+
+        np.testing.assert_allclose(
+            estimator.value(), np.percentile(self.values[:3], 50, axis=0)
+        )
+
+
+class TestEventHistogram(unittest.TestCase):
+    def test_matches_list(self):
+
+        # Arrange
+        events = [3, 1, 3, 7, 3]
+        histogram = EventHistogram()
+        other = EventHistogram()
+
+        # Act
+        histogram.append(events[0], weight=2)
+        histogram.extend(events[1:3], weights=2)
+        other.extend(events[3:], weights=2)
+        histogram.extend(other)
+
+        # Assert
+        time, count = histogram.unique()
+        expected_time, expected_count = np.unique(events, return_counts=True)
+        np.testing.assert_array_equal(time, expected_time)
+        np.testing.assert_array_equal(count, expected_count)
+        np.testing.assert_array_equal(
+            histogram.counts(minlength=10), np.bincount(events, minlength=10)
+        )
+        np.testing.assert_array_equal(histogram.totals(), 2 * np.bincount(events))
+        self.assertEqual(len(histogram), len(events))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -265,6 +265,65 @@ class TestTrigger(unittest.TestCase):
 
         np.testing.assert_array_equal(expected, output)
 
+    # *************** Test Compile ***********************
+
+    def test_compile_is_kept_until_triggers_change(self):
+
+        t = Trigger(**self.get_test_triggers(["state_1", "condition_1"]))
+
+        predicate = t.compile()
+        self.assertIs(predicate, t.compile())
+
+        t.set_logic(condition_logic="or")
+        self.assertIsNot(predicate, t.compile())
+
+        predicate = t.compile()
+        t.set_triggers_all(self.get_test_triggers(["state_2"]))
+        self.assertIsNot(predicate, t.compile())
+
+    def test_check_batch(self):
+
+        triggers = self.get_test_triggers(
+            ["state_1", "state_2", "condition_1", "condition_2"]
+        )
+        t = Trigger(**triggers)
+        expected = t.check(self.timeline)
+
+        batch = {key: np.tile(value, (3, 1)) for key, value in self.timeline.items()}
+        batch["time"] = self.timeline["time"]
+
+        output = t.check(batch)
+
+        np.testing.assert_array_equal(output, np.tile(expected, (3, 1)))
+
+    def test_check_condition_min_max(self):
+
+        expected = np.concatenate((np.full(31, True), np.full(70, False)))
+
+        t = Trigger(
+            conditions=dict(
+                condition_1=dict(lower=70, upper="max"),
+                condition_2=dict(lower="min", upper=None),
+            )
+        )
+        output = t.check_condition(self.timeline, t_start=0, t_end=101)
+
+        np.testing.assert_array_equal(expected, output)
+
+    def test_check_condition_monotone(self):
+
+        triggers = self.get_test_triggers(["condition_1", "condition_2"])
+        predicate = Trigger(condition_logic="or", **triggers).compile()
+
+        for t_start in [0, 15, 60]:
+            expected = predicate.check_condition(self.timeline, t_start, 101)
+
+            output = predicate.check_condition(
+                self.timeline, t_start, 101, monotone=["condition_1", "condition_2"]
+            )
+
+            np.testing.assert_array_equal(expected, output)
+
 
 if __name__ == "__main__":
     unittest.main()